@@ -1,25 +1,75 @@
 # ao.py  — Always-on task 런처 (웹앱 코드는 그대로 사용)
-from threading import Event, Thread
-import time
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
 
-from Blitz_app import create_app
+from sqlalchemy import select
+
+from Blitz_app import create_app, init_db
+from Blitz_app.extensions import db
 from Blitz_app.models import User
-from Blitz_app.bot import run_bot
-
-app = create_app()
-events = {}
-
-with app.app_context():
-    users = User.query.all()
-    for u in users:
-        cfg = u.to_dict()
-        # 누락 방지: 텔레그램 값 확실히 넣기
-        cfg['telegram_token'] = u.telegram_token or ''
-        cfg['telegram_chat_id'] = u.telegram_chat_id or ''
-        ev = Event()
-        events[u.id] = ev
-        Thread(target=run_bot, args=(cfg, ev, u.id), daemon=True).start()
-
-# 프로세스 유지
-while True:
-    time.sleep(60)
+from Blitz_app.bot import run_bot_async
+
+# run_bot 설정에 필요한 컬럼만 조회 (User.to_dict() 키 + 텔레그램 토큰)
+CFG_COLUMNS = (
+    User.email, User.api_key, User.api_secret,
+    User.telegram_token, User.telegram_chat_id,
+    User.uid, User.symbol, User.side, User.take_profit, User.stop_loss,
+    User.leverage, User.rounds, User.repeat, User.grids,
+    User.skip_uid_check, User.exchange,
+)
+
+
+def load_configs(app):
+    """유저별 (user_id, cfg) 목록"""
+    configs = []
+    with app.app_context():
+        # ORM 인스턴스 생성 없이 한 번의 SELECT로 모든 유저 설정을 가져옴
+        rows = db.session.execute(select(User.id, *CFG_COLUMNS)).all()
+        for row in rows:
+            # cfg는 일반 dict 유지: run_bot이 config['repeat']를 갱신하고,
+            # SimpleBotManager/BotManager도 같은 dict 형식으로 run_bot을 호출함
+            cfg = dict(row._mapping)
+            user_id = cfg.pop('id')
+            # 누락 방지: 텔레그램 값 확실히 넣기
+            cfg['telegram_token'] = cfg['telegram_token'] or ''
+            cfg['telegram_chat_id'] = cfg['telegram_chat_id'] or ''
+            configs.append((user_id, cfg))
+    return configs
+
+
+async def main():
+    app = create_app()
+    init_db(app)  # 단독 실행 시에도 스키마/추가 컬럼 보장 (멱등)
+    configs = load_configs(app)
+
+    loop = asyncio.get_running_loop()
+    # run_bot은 동기(ccxt REST) 코드 → 유저 수만큼 executor 슬롯 확보 (기본 executor는 최대 32)
+    # 주의: 봇마다 여전히 OS 스레드 1개를 점유함 → 스레드 메모리/컨텍스트 스위칭 절감은 없음
+    #       (이벤트 루프는 시작/종료 관리만 담당, 줄이려면 run_bot 자체를 async ccxt로 옮겨야 함)
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(len(configs), 1),
+                                                 thread_name_prefix='bot'))
+
+    # SIGTERM/SIGINT → 모든 봇에 중지 신호
+    stop_event = asyncio.Event()
+    signals = (signal.SIGTERM, signal.SIGINT)
+
+    def _shutdown():
+        print("🛑 종료 신호 수신 → 모든 봇 중지 중 (한 번 더 보내면 즉시 종료)")
+        stop_event.set()
+        # 두 번째 신호는 기본 동작(즉시 종료)으로 처리 → 봇 스레드가 sleep 중이어도 기다리지 않음
+        for s in signals:
+            loop.remove_signal_handler(s)
+
+    for sig in signals:
+        loop.add_signal_handler(sig, _shutdown)
+
+    async with asyncio.TaskGroup() as tg:
+        for user_id, cfg in configs:
+            tg.create_task(run_bot_async(cfg, stop_event, user_id))
+        # 프로세스 유지 (봇이 모두 끝나도 신호가 올 때까지 대기)
+        await stop_event.wait()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
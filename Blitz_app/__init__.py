@@ -1,15 +1,12 @@
 # Blitz_app/__init__.py
 
-from flask import Flask, redirect, url_for, flash
-from flask_login import current_user
-from flask_admin import Admin, AdminIndexView
-from flask_admin.contrib.sqla import ModelView
+from flask import Flask, g
 from flask_migrate import Migrate
-from flask_wtf.csrf import CSRFProtect
+from flask_wtf.csrf import CSRFProtect, generate_csrf
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 from flask_session import Session
-from redis import from_url
+import redis
 from sqlalchemy import select
 import os
 import logging
@@ -17,9 +14,28 @@ from .extensions import db, login_manager
 from .models import User, Trade, BotCommand, BotEvent, UserBot, OrderPlan, PnlSnapshot
 from .routes import main
 from .api_routes import api
+from .admin_views import register_admin
 from .models.proxy_model import Proxy
+from .db_utils import ensure_user_columns
+from . import manager_signal  # User 설정 변경 커밋 시 BotManager 깨우기 (SQLAlchemy 이벤트 등록)
 
 
+# 세션용 Redis 커넥션 풀 (프로세스당 URL별 1개, create_app 재호출 시 재사용)
+_redis_pools = {}
+
+
+def _get_redis_pool(url, max_connections):
+    pool = _redis_pools.get(url)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            socket_keepalive=True,
+            health_check_interval=30,
+        )
+        _redis_pools[url] = pool
+    return pool
+
 
 def datetimeformat(value):
     try:
@@ -90,17 +106,24 @@ def create_app():
     # Initialize CSRF protection
     csrf = CSRFProtect(app)
     
-    # Make CSRF token available in templates
+    # Make CSRF token available in templates (요청당 1회만 생성)
     @app.context_processor
     def inject_csrf_token():
-        from flask_wtf.csrf import generate_csrf
-        return dict(csrf_token=generate_csrf())
+        token = getattr(g, '_csrf_token', None)
+        if token is None:
+            token = generate_csrf()
+            g._csrf_token = token
+        return dict(csrf_token=token)
 
     # 🔗 Session 초기화 (Redis 불가용시 filesystem 사용)
     if app.config.get("SESSION_TYPE", "").lower() == "redis":
         try:
             redis_url = app.config.get("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
-            app.config["SESSION_REDIS"] = from_url(redis_url, decode_responses=False)
+            pool = _get_redis_pool(redis_url, app.config.get("SESSION_REDIS_MAX_CONNECTIONS", 64))
+            client = redis.Redis(connection_pool=pool)
+            # 실제 연결 확인 후에만 Redis 사용 (연결 실패 시 한 번만 fallback 결정)
+            client.ping()
+            app.config["SESSION_REDIS"] = client
         except Exception as e:
             # Redis 연결 실패시 filesystem으로 fallback
             print(f"⚠️ Redis 연결 실패, filesystem 세션으로 변경: {e}")
@@ -123,6 +146,9 @@ def create_app():
     app.register_blueprint(api)
     
     # Register SimpleBotManager API routes
+    # ⚠️ 모듈 상단으로 올리지 말 것: simple_bot_manager → Blitz_app.extensions → Blitz_app(__init__)
+    #    → api_bot_routes → simple_bot_manager 순환 import (simple_bot_manager를 먼저 import하면 실패)
+    #    create_app 호출당 1회만 실행되므로 요청 경로 비용은 없음
     from .api_bot_routes import api_bot
     app.register_blueprint(api_bot)
     
@@ -131,42 +157,35 @@ def create_app():
     init_simple_bot_manager(app)
     
 
-    # 🔐 관리자 접근 제한 Mixin
-    class AdminAccessMixin:
-        def is_accessible(self):
-            return current_user.is_authenticated and current_user.email == 'admin@admin.com'
-
-        def inaccessible_callback(self, name, **kwargs):
-            flash("접근 권한이 없습니다.", "danger")
-            return redirect(url_for('main.index'))
-
-    class SecureModelView(AdminAccessMixin, ModelView):
-        can_create = False
-        column_list = ('email', 'api_key', 'api_secret', 'telegram_token', 'symbol', 'side', 'leverage', 'repeat')
-        form_columns = ('email', 'api_key', 'api_secret', 'telegram_token', 'telegram_chat_id',
-                        'uid', 'symbol', 'side', 'take_profit', 'stop_loss',
-                        'leverage', 'rounds', 'repeat', 'skip_uid_check')
-    class SecureAdminIndexView(AdminAccessMixin, AdminIndexView): pass
+    # 🔐 관리자 인터페이스 (/admin_ui)
+    register_admin(app)
     print("✅ Flask 앱 생성 완료 및 Admin 인터페이스 설정됨")
 
+    # ✅ Jinja 필터 등록
+    app.add_template_filter(datetimeformat, 'datetimeformat')
 
+    # 🗄️ 스키마 생성/관리자 시드는 배포 시 1회만: `flask --app run.py init-db`
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables and seed the admin user."""
+        init_db(app)
+        print("✅ Database initialized")
 
-    admin = Admin(app, name='Blitz Admin', template_mode='bootstrap4', index_view=SecureAdminIndexView(url='/admin_ui'))
-    admin.add_view(SecureModelView(User, db.session))
-
-    class ProxyModelView(AdminAccessMixin, ModelView):
-        column_list = ('ip', 'port', 'username', 'password', 'assigned_user_id')
-        form_columns = ('ip', 'port', 'username', 'password', 'assigned_user_id')
-
-    admin.add_view(ProxyModelView(Proxy, db.session))  # ✅ 이렇게 바꿔야 함
+    return app
 
-    # ✅ Jinja 필터 등록
-    app.add_template_filter(datetimeformat, 'datetimeformat')
 
+def init_db(app):
+    """
+    Create all tables and seed the admin user.
+    
+    Kept out of create_app() so that building the app (every gunicorn worker,
+    every bot process) has no DDL or admin lookup side-effects. Run it once per
+    deployment via `flask --app run.py init-db` (gunicorn's master also calls it
+    in on_starting). Idempotent.
+    """
     with app.app_context():
         db.create_all()
+        ensure_user_columns()
         
         # Seed admin user (idempotent)
         seed_admin_user(app)
-
-    return app
@@ -0,0 +1,50 @@
+# Blitz_app/admin_views.py
+"""
+Flask-Admin views shared by every app instance.
+
+Defined once at import time so create_app() only instantiates and registers
+them instead of rebuilding the view classes on each call.
+"""
+
+from flask import redirect, url_for, flash
+from flask_login import current_user
+from flask_admin import Admin, AdminIndexView
+from flask_admin.contrib.sqla import ModelView
+
+from .extensions import db
+from .models import User, Proxy
+
+
+# 🔐 관리자 접근 제한 Mixin
+class AdminAccessMixin:
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.email == 'admin@admin.com'
+
+    def inaccessible_callback(self, name, **kwargs):
+        flash("접근 권한이 없습니다.", "danger")
+        return redirect(url_for('main.index'))
+
+
+class SecureModelView(AdminAccessMixin, ModelView):
+    can_create = False
+    column_list = ('email', 'api_key', 'api_secret', 'telegram_token', 'symbol', 'side', 'leverage', 'repeat')
+    form_columns = ('email', 'api_key', 'api_secret', 'telegram_token', 'telegram_chat_id',
+                    'uid', 'symbol', 'side', 'take_profit', 'stop_loss',
+                    'leverage', 'rounds', 'repeat', 'skip_uid_check')
+
+
+class SecureAdminIndexView(AdminAccessMixin, AdminIndexView):
+    pass
+
+
+class ProxyModelView(AdminAccessMixin, ModelView):
+    column_list = ('ip', 'port', 'username', 'password', 'assigned_user_id')
+    form_columns = ('ip', 'port', 'username', 'password', 'assigned_user_id')
+
+
+def register_admin(app):
+    """Attach the Blitz Admin interface (/admin_ui) to the app"""
+    admin = Admin(app, name='Blitz Admin', template_mode='bootstrap4', index_view=SecureAdminIndexView(url='/admin_ui'))
+    admin.add_view(SecureModelView(User, db.session))
+    admin.add_view(ProxyModelView(Proxy, db.session))
+    return admin
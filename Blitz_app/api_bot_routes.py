@@ -10,16 +10,24 @@ Provides the 4 core endpoints for bot control and 1 admin endpoint:
 - GET  /admin/simple/status (admin only)
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, request
 from flask_login import login_required, current_user
 from simple_bot_manager import get_simple_bot_manager
+from Blitz_app.json_response import ojsonify
+from Blitz_app.utils import admin_required_guard
 from datetime import datetime
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 api_bot = Blueprint('api_bot', __name__)
 
+# 관리자 전용 (/admin/simple/...) - 권한 검사는 before_request 한 곳에서 처리
+admin_simple = Blueprint('admin_simple', __name__, url_prefix='/admin/simple')
+admin_simple.before_request(admin_required_guard)
+api_bot.register_blueprint(admin_simple)
+
 @api_bot.route('/api/bot/start', methods=['POST'])
 @login_required
 def start_bot():
@@ -30,7 +38,7 @@ def start_bot():
     try:
         manager = get_simple_bot_manager()
         if not manager:
-            return jsonify({
+            return ojsonify({
                 "success": False,
                 "message": "Bot manager not initialized",
                 "status": "error"
@@ -43,15 +51,15 @@ def start_bot():
         
         # Return appropriate HTTP status
         if result['success']:
-            return jsonify(result), 200
+            return ojsonify(result), 200
         elif result['status'] == 'already_running':
-            return jsonify(result), 409  # Conflict
+            return ojsonify(result), 409  # Conflict
         else:
-            return jsonify(result), 400  # Bad Request
+            return ojsonify(result), 400  # Bad Request
             
     except Exception as e:
         logger.error(f"Error in start_bot for user {current_user.id}: {e}")
-        return jsonify({
+        return ojsonify({
             "success": False,
             "message": f"Internal error: {str(e)}",
             "status": "error"
@@ -67,7 +75,7 @@ def stop_bot():
     try:
         manager = get_simple_bot_manager()
         if not manager:
-            return jsonify({
+            return ojsonify({
                 "success": False,
                 "message": "Bot manager not initialized",
                 "status": "error"
@@ -80,13 +88,13 @@ def stop_bot():
         
         # Return appropriate HTTP status
         if result['success']:
-            return jsonify(result), 200
+            return ojsonify(result), 200
         else:
-            return jsonify(result), 400  # Bad Request
+            return ojsonify(result), 400  # Bad Request
             
     except Exception as e:
         logger.error(f"Error in stop_bot for user {current_user.id}: {e}")
-        return jsonify({
+        return ojsonify({
             "success": False,
             "message": f"Internal error: {str(e)}",
             "status": "error"
@@ -102,7 +110,7 @@ def get_bot_status():
     try:
         manager = get_simple_bot_manager()
         if not manager:
-            return jsonify({
+            return ojsonify({
                 "running": False,
                 "status": "error",
                 "uptime": 0,
@@ -110,11 +118,11 @@ def get_bot_status():
             }), 500
         
         result = manager.get_bot_status(current_user.id)
-        return jsonify(result), 200
+        return ojsonify(result), 200
         
     except Exception as e:
         logger.error(f"Error in get_bot_status for user {current_user.id}: {e}")
-        return jsonify({
+        return ojsonify({
             "running": False,
             "status": "error", 
             "uptime": 0,
@@ -132,7 +140,7 @@ def recover_bot_orders():
     try:
         manager = get_simple_bot_manager()
         if not manager:
-            return jsonify({
+            return ojsonify({
                 "success": False,
                 "message": "Bot manager not initialized", 
                 "actions": []
@@ -145,35 +153,28 @@ def recover_bot_orders():
         
         # Return appropriate HTTP status
         if result['success']:
-            return jsonify(result), 200
+            return ojsonify(result), 200
         else:
-            return jsonify(result), 400  # Bad Request
+            return ojsonify(result), 400  # Bad Request
             
     except Exception as e:
         logger.error(f"Error in recover_bot_orders for user {current_user.id}: {e}")
-        return jsonify({
+        return ojsonify({
             "success": False,
             "message": f"Internal error: {str(e)}",
             "actions": []
         }), 500
 
-@api_bot.route('/admin/simple/status', methods=['GET'])
-@login_required
+@admin_simple.route('/status', methods=['GET'])
 def admin_bot_status():
     """
     Admin-only endpoint to get status of all managed bots.
     Returns: {"users": {user_id: {...}}, "totals": {...}}
     """
     try:
-        # Check admin permission
-        if current_user.email != 'admin@admin.com':
-            return jsonify({
-                "error": "Admin access required"
-            }), 403
-        
         manager = get_simple_bot_manager()
         if not manager:
-            return jsonify({
+            return ojsonify({
                 "users": {},
                 "totals": {
                     "total_managed": 0,
@@ -183,11 +184,11 @@ def admin_bot_status():
             }), 500
         
         result = manager.get_all_bot_statuses()
-        return jsonify(result), 200
+        return ojsonify(result), 200
         
     except Exception as e:
         logger.error(f"Error in admin_bot_status: {e}")
-        return jsonify({
+        return ojsonify({
             "users": {},
             "totals": {
                 "total_managed": 0,
@@ -196,6 +197,24 @@ def admin_bot_status():
             }
         }), 500
 
+def _resolve_db_info(app):
+    """debug_db용 경로 정보 (cwd, instance_path, db_uri, db_path) 계산"""
+    instance_path = app.instance_path
+    db_uri = app.config.get('SQLALCHEMY_DATABASE_URI', 'Not configured')
+    
+    # Extract actual file path from SQLite URI
+    db_path = "N/A"
+    if db_uri.startswith('sqlite:///'):
+        # os.path.join은 절대 경로가 오면 그대로 반환
+        db_path = os.path.join(instance_path, db_uri.replace('sqlite:///', ''))
+    
+    return {
+        "cwd": os.getcwd(),
+        "instance_path": instance_path,
+        "db_uri": db_uri,
+        "db_path": db_path,
+    }
+
 @api_bot.route('/__debug/db', methods=['GET'])
 def debug_db():
     """
@@ -203,39 +222,29 @@ def debug_db():
     Returns: {"cwd": str, "instance_path": str, "db_uri": str, "db_path": str, "db_exists": bool}
     """
     try:
-        import os
-        from pathlib import Path
-        from flask import current_app
+        # 경로 정보는 앱당 한 번만 계산 → 요청마다 os.stat 한 번만 호출
+        info = current_app.extensions.get('debug_db_path')
+        if info is None:
+            info = current_app.extensions['debug_db_path'] = _resolve_db_info(current_app)
         
-        # Get current working directory
-        cwd = os.getcwd()
-        
-        # Get Flask instance path
-        instance_path = current_app.instance_path
-        
-        # Get database URI from config
-        db_uri = current_app.config.get('SQLALCHEMY_DATABASE_URI', 'Not configured')
-        
-        # Extract actual file path from SQLite URI
-        db_path = "N/A"
         db_exists = False
-        
-        if db_uri.startswith('sqlite:///'):
-            db_path = db_uri.replace('sqlite:///', '')
-            if not os.path.isabs(db_path):
-                db_path = os.path.join(instance_path, db_path)
-            db_exists = os.path.exists(db_path)
-        
-        return jsonify({
-            "cwd": cwd,
-            "instance_path": instance_path,
-            "db_uri": db_uri,
-            "db_path": db_path,
+        if info['db_path'] != "N/A":
+            try:
+                os.stat(info['db_path'])
+                db_exists = True
+            except OSError:
+                pass
+        
+        return ojsonify({
+            "cwd": info['cwd'],
+            "instance_path": info['instance_path'],
+            "db_uri": info['db_uri'],
+            "db_path": info['db_path'],
             "db_exists": db_exists,
             "timestamp": str(datetime.utcnow())
         }), 200
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             "error": f"Debug error: {str(e)}"
         }), 500
\ No newline at end of file
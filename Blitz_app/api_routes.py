@@ -1,31 +1,59 @@
 # Blitz_app/api_routes.py
 
-from flask import Blueprint, request, jsonify
-from flask_login import login_required, current_user
-from datetime import datetime
+from flask import Blueprint, request
+from flask_login import login_required
 import hashlib
 import time
 import json
+from sqlalchemy import case, func, literal, literal_column, null, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from .extensions import db
 from .models import BotCommand, BotEvent, UserBot, User
-from .utils import is_admin
+from .utils import admin_required_guard, is_admin, owner_or_admin
+from .json_response import ojsonify, oloads
 
 api = Blueprint('api', __name__, url_prefix='/api')
 
-def generate_idempotency_key(user_id: int, command_type: str, payload: dict = None) -> str:
+# 관리자 전용 API (/api/admin/...) - 권한 검사는 before_request 한 곳에서 처리
+admin_api = Blueprint('admin_api', __name__, url_prefix='/admin')
+admin_api.before_request(admin_required_guard)
+api.register_blueprint(admin_api)
+
+# 같은 사용자/명령/페이로드 요청을 중복으로 보는 시간 창(초)
+IDEMPOTENCY_WINDOW_SEC = 5
+
+def generate_idempotency_key(user_id: int, command_type: str, payload: dict = None, window: int = None) -> str:
     """Generate idempotency key for commands"""
-    data = f"{user_id}:{command_type}:{json.dumps(payload or {}, sort_keys=True)}"
-    return hashlib.md5(data.encode()).hexdigest()
+    data = f"{user_id}:{command_type}:{json.dumps(payload or {}, sort_keys=True)}:{window}"
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
 
 def create_bot_command(user_id: int, command_type: str, payload: dict = None) -> dict:
     """Create a bot command with idempotency"""
     try:
-        idempotency_key = f"{command_type}_{user_id}_{int(time.time() * 1000)}"
+        # monotonic_ns()가 아닌 wall clock 사용: 키가 DB에 영구 저장되므로
+        # 재부팅(monotonic 리셋)이나 다른 호스트의 워커와도 같은 시간 창을 가리켜야 함
+        window = int(time.time()) // IDEMPOTENCY_WINDOW_SEC
+        idempotency_key = generate_idempotency_key(user_id, command_type, payload, window)
+        
+        # 한 번의 INSERT ... ON CONFLICT DO NOTHING RETURNING으로 중복 검사 + 생성 (SELECT 후 INSERT 경쟁 제거)
+        insert = pg_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert(BotCommand).values(
+            user_id=user_id,
+            type=command_type,
+            payload=json.dumps(payload or {}),
+            status='queued',
+            idempotency_key=idempotency_key
+        ).on_conflict_do_nothing(index_elements=['idempotency_key']).returning(BotCommand.id)
+        command_id = db.session.execute(stmt).scalar()
         
-        # Check for existing command with same idempotency key
-        existing = BotCommand.query.filter_by(idempotency_key=idempotency_key).first()
-        if existing:
+        if command_id is None:
+            # 같은 idempotency key의 명령이 이미 있음
+            existing = db.session.execute(
+                select(BotCommand.id, BotCommand.status)
+                .where(BotCommand.idempotency_key == idempotency_key)
+            ).one()
             return {
                 'success': True,
                 'command_id': existing.id,
@@ -33,23 +61,12 @@ def create_bot_command(user_id: int, command_type: str, payload: dict = None) ->
                 'message': 'Command already exists'
             }
         
-        # Create new command
-        command = BotCommand(
-            user_id=user_id,
-            type=command_type,
-            payload=json.dumps(payload or {}),
-            status='queued',
-            idempotency_key=idempotency_key
-        )
-        db.session.add(command)
-        db.session.commit()
-        
         # Log event
         event = BotEvent(
             user_id=user_id,
             type='command_queued',
             payload=json.dumps({
-                'command_id': command.id,
+                'command_id': command_id,
                 'command_type': command_type,
                 'payload': payload
             })
@@ -59,7 +76,7 @@ def create_bot_command(user_id: int, command_type: str, payload: dict = None) ->
         
         return {
             'success': True,
-            'command_id': command.id,
+            'command_id': command_id,
             'status': 'queued',
             'message': 'Command queued successfully'
         }
@@ -74,11 +91,9 @@ def create_bot_command(user_id: int, command_type: str, payload: dict = None) ->
 
 @api.route('/users/<int:user_id>/commands/recover_orders', methods=['POST'])
 @login_required
+@owner_or_admin
 def recover_orders(user_id):
     """주문 복구 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     data = request.get_json() or {}
     payload = {
         'symbol': data.get('symbol'),
@@ -87,25 +102,21 @@ def recover_orders(user_id):
     }
     
     result = create_bot_command(user_id, 'recover_orders', payload)
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/restart_bot', methods=['POST'])
 @login_required
+@owner_or_admin
 def restart_bot(user_id):
     """봇 재시작 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     result = create_bot_command(user_id, 'restart_bot')
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/resync_tp', methods=['POST'])
 @login_required
+@owner_or_admin
 def resync_tp(user_id):
     """TP 재동기화 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     data = request.get_json() or {}
     payload = {
         'symbol': data.get('symbol'),
@@ -113,15 +124,13 @@ def resync_tp(user_id):
     }
     
     result = create_bot_command(user_id, 'resync_tp', payload)
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/cancel_all', methods=['POST'])
 @login_required
+@owner_or_admin
 def cancel_all_orders(user_id):
     """전체 주문 취소 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     data = request.get_json() or {}
     payload = {
         'symbol': data.get('symbol'),
@@ -129,15 +138,13 @@ def cancel_all_orders(user_id):
     }
     
     result = create_bot_command(user_id, 'cancel_all', payload)
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/force_close', methods=['POST'])
 @login_required
+@owner_or_admin
 def force_close_position(user_id):
     """포지션 강제 청산 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     data = request.get_json() or {}
     payload = {
         'symbol': data.get('symbol'),
@@ -145,34 +152,32 @@ def force_close_position(user_id):
     }
     
     result = create_bot_command(user_id, 'force_close', payload)
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/reset_plan', methods=['POST'])
 @login_required
+@owner_or_admin
 def reset_plan(user_id):
     """계획 초기화 명령"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     result = create_bot_command(user_id, 'reset_plan')
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/unlock', methods=['POST'])
 @login_required
 def unlock_user(user_id):
     """사용자 잠금 해제 명령"""
     if not is_admin():
-        return jsonify({'error': 'Admin access required'}), 403
+        return ojsonify({'error': 'Admin access required'}), 403
     
     result = create_bot_command(user_id, 'unlock')
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/commands/update_rounds', methods=['POST'])
 @login_required
 def update_rounds(user_id):
     """진입 라운드/총 N 업데이트 명령"""
     if not is_admin():
-        return jsonify({'error': 'Admin access required'}), 403
+        return ojsonify({'error': 'Admin access required'}), 403
     
     data = request.get_json() or {}
     payload = {
@@ -181,176 +186,209 @@ def update_rounds(user_id):
     }
     
     if not payload['rounds']:
-        return jsonify({'error': 'rounds parameter required'}), 400
+        return ojsonify({'error': 'rounds parameter required'}), 400
     
     result = create_bot_command(user_id, 'update_rounds', payload)
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/bot/start', methods=['POST'])
 @login_required
+@owner_or_admin
 def start_user_bot(user_id):
     """사용자 봇 시작"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     result = create_bot_command(user_id, 'start_bot')
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
 
 @api.route('/users/<int:user_id>/bot/stop', methods=['POST'])
 @login_required
+@owner_or_admin
 def stop_user_bot(user_id):
     """사용자 봇 중지"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     result = create_bot_command(user_id, 'stop_bot')
-    return jsonify(result), 200 if result['success'] else 400
+    return ojsonify(result), 200 if result['success'] else 400
+
+def _load_payload(raw) -> dict:
+    """JSON payload 컬럼 파싱 (payload_dict 프로퍼티와 동일한 규칙)"""
+    try:
+        return oloads(raw) if raw else {}
+    except:
+        return {}
+
+def _recent_activity_stmt(user_id: int, commands_limit: int = 5, events_limit: int = 10):
+    """최근 명령/이벤트를 kind('cmd'|'evt')로 태그해 한 쿼리로 조회"""
+    cmd_sq = select(
+        literal('cmd').label('kind'),
+        BotCommand.id,
+        BotCommand.type,
+        BotCommand.status,
+        BotCommand.created_at,
+        BotCommand.error_message.label('detail')
+    ).where(BotCommand.user_id == user_id)\
+        .order_by(BotCommand.created_at.desc())\
+        .limit(commands_limit).subquery()
+    
+    evt_sq = select(
+        literal('evt').label('kind'),
+        BotEvent.id,
+        BotEvent.type,
+        null().label('status'),
+        BotEvent.created_at,
+        BotEvent.payload.label('detail')
+    ).where(BotEvent.user_id == user_id)\
+        .order_by(BotEvent.created_at.desc())\
+        .limit(events_limit).subquery()
+    
+    return union_all(select(cmd_sq), select(evt_sq))\
+        .order_by(literal_column('kind'), literal_column('created_at').desc())
 
 @api.route('/users/<int:user_id>/status', methods=['GET'])
 @login_required
+@owner_or_admin
 def get_user_bot_status(user_id):
     """사용자 봇 상태 조회"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     try:
         # Get bot info
         bot_info = UserBot.query.get(user_id)
         
-        # Get recent commands
-        recent_commands = BotCommand.query.filter_by(user_id=user_id)\
-            .order_by(BotCommand.created_at.desc())\
-            .limit(5).all()
-        
-        # Get recent events
-        recent_events = BotEvent.query.filter_by(user_id=user_id)\
-            .order_by(BotEvent.created_at.desc())\
-            .limit(10).all()
+        # Get recent commands + events in one round-trip (UNION ALL)
+        recent_commands = []
+        recent_events = []
+        for row in db.session.execute(_recent_activity_stmt(user_id)):
+            if row.kind == 'cmd':
+                recent_commands.append({
+                    'id': row.id,
+                    'type': row.type,
+                    'status': row.status,
+                    'created_at': row.created_at,
+                    'error_message': row.detail
+                })
+            else:
+                recent_events.append({
+                    'id': row.id,
+                    'type': row.type,
+                    'payload': _load_payload(row.detail),
+                    'created_at': row.created_at
+                })
         
-        return jsonify({
+        return ojsonify({
             'user_id': user_id,
             'bot_status': bot_info.status if bot_info else 'stopped',
             'bot_pid': bot_info.pid if bot_info else None,
-            'last_heartbeat': bot_info.last_heartbeat_at.isoformat() if bot_info and bot_info.last_heartbeat_at else None,
+            'last_heartbeat': bot_info.last_heartbeat_at if bot_info else None,
             'restart_count': bot_info.restart_count if bot_info else 0,
-            'recent_commands': [{
-                'id': cmd.id,
-                'type': cmd.type,
-                'status': cmd.status,
-                'created_at': cmd.created_at.isoformat(),
-                'error_message': cmd.error_message
-            } for cmd in recent_commands],
-            'recent_events': [{
-                'id': event.id,
-                'type': event.type,
-                'payload': event.payload_dict,
-                'created_at': event.created_at.isoformat()
-            } for event in recent_events]
+            'recent_commands': recent_commands,
+            'recent_events': recent_events
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 @api.route('/users/<int:user_id>/commands/<int:command_id>/status', methods=['GET'])
 @login_required
+@owner_or_admin
 def get_command_status(user_id, command_id):
     """명령 상태 조회"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     try:
         command = BotCommand.query.filter_by(id=command_id, user_id=user_id).first()
         if not command:
-            return jsonify({'error': 'Command not found'}), 404
+            return ojsonify({'error': 'Command not found'}), 404
         
-        return jsonify({
+        return ojsonify({
             'command_id': command.id,
             'type': command.type,
             'status': command.status,
-            'created_at': command.created_at.isoformat(),
-            'picked_at': command.picked_at.isoformat() if command.picked_at else None,
-            'done_at': command.done_at.isoformat() if command.done_at else None,
+            'created_at': command.created_at,
+            'picked_at': command.picked_at,
+            'done_at': command.done_at,
             'picked_by': command.picked_by,
             'error_message': command.error_message,
             'payload': command.payload_dict
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
+
+def _heartbeat_age_expr():
+    """UserBot.last_heartbeat_at(naive UTC) 기준 경과 초 SQL 식 (NULL이면 NULL)"""
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday('now') - func.julianday(UserBot.last_heartbeat_at)) * 86400.0
+    return func.extract('epoch', func.timezone('UTC', func.now()) - UserBot.last_heartbeat_at)
 
 # Admin-only endpoints
-@api.route('/admin/health', methods=['GET'])
-@login_required
+@admin_api.route('/health', methods=['GET'])
 def admin_health_check():
     """전체 시스템 헬스 체크"""
-    if not is_admin():
-        return jsonify({'error': 'Admin access required'}), 403
-    
     try:
-        # Get all user bots
-        user_bots = UserBot.query.all()
+        # Get all user bots (heartbeat age는 DB에서 계산)
+        user_bots = db.session.execute(select(
+            UserBot.user_id,
+            UserBot.status,
+            UserBot.pid,
+            UserBot.restart_count,
+            UserBot.last_error,
+            _heartbeat_age_expr().label('heartbeat_age')
+        )).all()
+        
+        # Bot counts (SQL 집계)
+        total_bots, running_bots = db.session.query(
+            func.count(UserBot.user_id),
+            func.count(case((UserBot.status == 'running', 1)))
+        ).one()
         
         # Get pending commands count
         pending_commands = BotCommand.query.filter_by(status='queued').count()
         
-        # Get recent errors
-        recent_errors = BotEvent.query.filter_by(type='error')\
-            .order_by(BotEvent.created_at.desc())\
-            .limit(10).all()
+        # Get recent errors (ORM 객체 대신 필요한 컬럼만 조회)
+        recent_errors = db.session.execute(
+            select(BotEvent.user_id, BotEvent.payload, BotEvent.created_at)
+            .where(BotEvent.type == 'error')
+            .order_by(BotEvent.created_at.desc())
+            .limit(10)
+        ).all()
         
         bot_status = {}
         for bot in user_bots:
-            heartbeat_age = None
-            if bot.last_heartbeat_at:
-                heartbeat_age = (datetime.utcnow() - bot.last_heartbeat_at).total_seconds()
-            
             bot_status[bot.user_id] = {
                 'status': bot.status,
                 'pid': bot.pid,
-                'heartbeat_age_seconds': heartbeat_age,
+                'heartbeat_age_seconds': bot.heartbeat_age,
                 'restart_count': bot.restart_count,
                 'last_error': bot.last_error
             }
         
-        return jsonify({
-            'total_bots': len(user_bots),
-            'running_bots': len([b for b in user_bots if b.status == 'running']),
+        return ojsonify({
+            'total_bots': total_bots,
+            'running_bots': running_bots,
             'pending_commands': pending_commands,
             'bot_status': bot_status,
             'recent_errors': [{
                 'user_id': event.user_id,
-                'payload': event.payload_dict,
-                'created_at': event.created_at.isoformat()
+                'payload': _load_payload(event.payload),
+                'created_at': event.created_at
             } for event in recent_errors]
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
-@api.route('/admin/users', methods=['GET'])
-@login_required
+@admin_api.route('/users', methods=['GET'])
 def admin_list_users():
     """관리자 - 사용자 목록"""
-    if not is_admin():
-        return jsonify({'error': 'Admin access required'}), 403
-    
     try:
         search = request.args.get('search', '').strip()
         
-        query = User.query
+        # User + UserBot 한 번의 LEFT OUTER JOIN으로 조회 (N+1 제거)
+        stmt = select(User, UserBot).outerjoin(UserBot, UserBot.user_id == User.id)
         if search:
-            query = query.filter(
-                db.or_(
-                    User.email.ilike(f'%{search}%'),
-                    User.id == int(search) if search.isdigit() else False
-                )
-            )
+            condition = User.email.ilike(f'%{search}%')
+            if search.isdigit():
+                condition = db.or_(condition, User.id == int(search))
+            stmt = stmt.where(condition)
         
-        users = query.limit(50).all()
+        rows = db.session.execute(stmt.limit(50)).all()
         
         result = []
-        for user in users:
-            bot_info = UserBot.query.get(user.id)
+        for user, bot_info in rows:
             result.append({
                 'id': user.id,
                 'email': user.email,
@@ -363,53 +401,45 @@ def admin_list_users():
                 'bot_pid': bot_info.pid if bot_info else None
             })
         
-        return jsonify({'users': result})
+        return ojsonify({'users': result})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 # PnL API routes
 @api.route('/users/<int:user_id>/pnl/summary', methods=['GET'])
 @login_required
+@owner_or_admin
 def get_user_pnl_summary(user_id):
     """사용자 PnL 요약 조회"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     try:
         from .pnl_service import PnlService
         summary = PnlService.get_user_pnl_summary(user_id)
-        return jsonify(summary)
+        return ojsonify(summary)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
 @api.route('/users/<int:user_id>/pnl/daily', methods=['GET'])
 @login_required
+@owner_or_admin
 def get_user_daily_pnl(user_id):
     """사용자 일별 PnL 조회"""
-    if not is_admin() and current_user.id != user_id:
-        return jsonify({'error': 'Forbidden'}), 403
-    
     try:
         from .pnl_service import PnlService
         daily_data = PnlService.aggregate_daily_pnl(user_id, update_snapshots=True)
-        return jsonify({'daily_data': daily_data})
+        return ojsonify({'daily_data': daily_data})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojsonify({'error': str(e)}), 500
 
-@api.route('/admin/pnl/all_users', methods=['GET'])
-@login_required
+@admin_api.route('/pnl/all_users', methods=['GET'])
 def get_all_users_pnl():
     """전체 사용자 PnL 요약"""
-    if not is_admin():
-        return jsonify({'error': 'Admin access required'}), 403
-    
     try:
         from .pnl_service import PnlService
         summaries = PnlService.get_all_users_pnl_summary()
-        return jsonify({'users': summaries})
+        return ojsonify({'users': summaries})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return ojsonify({'error': str(e)}), 500
\ No newline at end of file
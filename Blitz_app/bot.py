@@ -1,19 +1,30 @@
+import asyncio
 import ccxt
+import functools
+import itertools
 import math
+import re
+import secrets
 import time
 import json
 import logging
-from threading import Event
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
 from .telegram import send_telegram
 from .utils import (
     normalize_symbol, cancel_tp_sl_orders, cancel_entry_orders,
-    get_position, place_manual_tp_order, place_manual_sl_order,
+    get_position, place_manual_tp_sl_orders, create_orders_batched,
+    amend_tp_sl_orders, market_spec,
     ensure_tp_exists,
 )
 from .trade_log import record_trade
 from .bot_state import bot_events, force_refresh_flags, single_refresh_flags
 from .bot_state import repeat_overrides
 from .bot_command_processor import BotCommandProcessor
+from .position_feed import PositionFeed
 from Blitz_app.models import Proxy
 from Blitz_app import db
 
@@ -32,6 +43,9 @@ status = "대기 중"
 
 
 # ------- 유틸들 -------
+# 읽기 전용 빈 dict (매번 `or {}`로 새 dict를 만들지 않도록). 절대 수정하지 말 것
+_EMPTY = {}
+
 def _to_bool(x):
     """다양한 형태(true/false/1/0/'True'/'false'/None)를 안전하게 bool/None으로 변환"""
     if isinstance(x, bool):
@@ -45,30 +59,36 @@ def _to_bool(x):
         return False
     return None  # 알 수 없으면 None
 
+# positionSide/posSide → 방향 (거래소가 실제로 보내는 표기는 몇 가지뿐이라 dict 조회로 처리)
+_PS_MAP = {'LONG': 'long', 'SHORT': 'short', 'Long': 'long', 'Short': 'short',
+           'long': 'long', 'short': 'short'}
+# positionIdx(헤지 모드) → 방향 (1 == 1.0 이므로 float도 같이 처리됨)
+_IDX_MAP = {1: 'long', '1': 'long', 2: 'short', '2': 'short'}
+
 def _infer_pos_side(trade, current_position, user_side):
     """
     positionSide / posSide / positionIdx / 현재포지션 / 유저설정 순으로 포지션 방향 추론
     반환값: 'long' | 'short' | None
     """
-    info = trade.get("info") or {}
-    ps = info.get("positionSide") or info.get("posSide") or ""
-    if isinstance(ps, str) and ps:
+    info = trade.get("info") or _EMPTY
+    ps = info.get("positionSide") or info.get("posSide")
+    if ps and isinstance(ps, str):
+        r = _PS_MAP.get(ps)
+        if r:
+            return r
+        # 표에 없는 표기(예: 'LongSide')만 부분 문자열 검사
         s = ps.lower()
         if "long" in s:
             return "long"
         if "short" in s:
             return "short"
 
-    idx = info.get("positionIdx")
-    if idx is not None:
-        try:
-            idx = int(idx)
-            if idx == 1:
-                return "long"
-            if idx == 2:
-                return "short"
-        except:
-            pass
+    try:
+        r = _IDX_MAP.get(info.get("positionIdx"))
+    except TypeError:  # 비정상 payload(list 등)
+        r = None
+    if r:
+        return r
 
     if current_position:
         side = (current_position.get("side") or "").lower()
@@ -82,34 +102,57 @@ def _infer_pos_side(trade, current_position, user_side):
 
     return None
 
-def _calc_trade_pnl(trade, pos_side, avg_entry):
+def _norm_pos(p):
+    """포지션을 수신 직후 한 번만 float로 정규화 (메인 루프에서 float() 반복 방지)"""
+    if not p:
+        return None
+    return {'contracts': float(p.get('contracts') or 0),
+            'entryPrice': float(p.get('entryPrice') or 0),
+            'side': p.get('side')}
+
+# 원 데이터 PnL 키: 거래소별로 실제 쓰는 키만 먼저 확인하고, 없으면 전체 목록으로 폴백
+_PNL_KEYS_BYBIT = ("closedPnl", "realizedPnl")
+_PNL_KEYS_BINGX = ("realizedProfit", "realizedPnl")
+_PNL_KEYS_ALL = ("realizedPnl", "execPnl", "closedPnl", "realizedProfit", "profit", "pnl")
+_PNL_KEYS_BY_EXCHANGE = {"bybit": _PNL_KEYS_BYBIT, "bingx": _PNL_KEYS_BINGX}
+
+
+def _vendor_pnl(trade, info, keys):
+    """키마다 trade → info 순서로 확인해 첫 PnL 값을 반환 (없으면 None)
+    - 빈 값과 문자열 "0"/"0.0"만 건너뜀 (숫자 0/0.0은 기존처럼 그대로 반환)"""
+    for k in keys:
+        for src in (trade, info):
+            v = src.get(k)
+            if v not in (None, "", "0", "0.0"):
+                try:
+                    return float(v)
+                except (TypeError, ValueError):
+                    pass
+    return None
+
+
+def _calc_trade_pnl(trade, pos_side, avg_entry, exchange_name=None):
     """
     거래 단건에 대해 PnL을 계산(원 데이터에 PnL 있으면 우선, 없으면 백업 계산)
+    - exchange_name을 주면 해당 거래소의 PnL 키만 먼저 확인
     - reduceOnly를 안전하게 파싱
     - 포지션 감소 체결만 계산 (long→sell, short→buy)
     - 수수료(execFee/fee.cost) 차감
     반환: float PnL
     """
     pnl = 0.0
-    info = trade.get("info") or {}
+    info = trade.get("info") or _EMPTY
     px = trade.get("price")
     qty = trade.get("amount")
     side_trd = (trade.get("side") or "").lower()  # 'buy' | 'sell'
 
     # 1) 원 데이터의 PnL 우선
-    for k in ("realizedPnl", "execPnl", "closedPnl", "realizedProfit", "profit", "pnl"):
-        v = trade.get(k)
-        if v not in (None, "", "0", "0.0"):
-            try:
-                return float(v)
-            except:
-                pass
-        v = info.get(k)
-        if v not in (None, "", "0", "0.0"):
-            try:
-                return float(v)
-            except:
-                pass
+    keys = _PNL_KEYS_BY_EXCHANGE.get(exchange_name)
+    v = _vendor_pnl(trade, info, keys) if keys else None
+    if v is None:
+        v = _vendor_pnl(trade, info, _PNL_KEYS_ALL)
+    if v is not None:
+        return v
 
     # 2) 백업 계산 (필수 값 확인)
     try:
@@ -138,7 +181,7 @@ def _calc_trade_pnl(trade, pos_side, avg_entry):
 
             # 수수료 반영
             fee_cost = 0.0
-            fee = trade.get("fee") or {}
+            fee = trade.get("fee") or _EMPTY
             try:
                 fee_cost = abs(float(fee.get("cost", 0) or 0))
             except:
@@ -157,6 +200,71 @@ def _calc_trade_pnl(trade, pos_side, avg_entry):
 
     return pnl
 
+# load_markets 결과 캐시: (거래소 id, defaultType) → (로드 시각(monotonic), 마켓 속성)
+# 봇 재시작/재시도마다 전체 마켓 JSON을 다시 받지 않도록 10분간 재사용
+_MARKETS_CACHE = {}
+MARKETS_CACHE_TTL = 600.0
+_MARKET_ATTRS = ('markets', 'markets_by_id', 'symbols', 'ids', 'currencies',
+                 'currencies_by_id', 'codes', 'baseCurrencies', 'quoteCurrencies')
+
+def _load_markets_cached(exchange):
+    """exchange.load_markets() 대체: TTL 내 캐시가 있으면 HTTP 호출 없이 마켓 속성만 주입"""
+    key = (exchange.id, (exchange.options or {}).get('defaultType'))
+    cached = _MARKETS_CACHE.get(key)
+    if cached and time.monotonic() - cached[0] < MARKETS_CACHE_TTL:
+        for attr, value in cached[1].items():
+            setattr(exchange, attr, value)
+        return exchange.markets
+    markets = exchange.load_markets()
+    _MARKETS_CACHE[key] = (time.monotonic(), {a: getattr(exchange, a, None) for a in _MARKET_ATTRS})
+    return markets
+
+# USDT 무기한 선물 심볼 캐시: (거래소 id, 마켓 키 집합) → 심볼 튜플 (봇 재시작마다 전체 마켓 재스캔 방지)
+_FUTURES_SYMBOLS_CACHE = {}
+
+def _futures_markets(exchange):
+    """exchange.markets 중 USDT 무기한 선물만 (값은 항상 현재 markets의 최신 dict)"""
+    markets = exchange.markets
+    key = (exchange.id, frozenset(markets))
+    symbols = _FUTURES_SYMBOLS_CACHE.get(key)
+    if symbols is None:
+        symbols = tuple(
+            k for k, v in markets.items()
+            if (v.get('contract') or v.get('future') or v.get('swap'))
+            and v.get('quote') == 'USDT'
+            and ('swap' in v.get('type', '').lower() or 'perpetual' in v.get('type', '').lower())
+        )
+        if len(_FUTURES_SYMBOLS_CACHE) >= 8:
+            _FUTURES_SYMBOLS_CACHE.clear()
+        _FUTURES_SYMBOLS_CACHE[key] = symbols
+    return {k: markets[k] for k in symbols}
+
+class _PersistentSession(requests.Session):
+    """
+    봇 재시도/재시작과 유저를 가리지 않고 유지되는 HTTP 세션 (keep-alive 커넥션 재사용).
+    ccxt Exchange.__del__/close()가 세션을 닫아버리므로 close()는 무시한다.
+    """
+    def close(self):
+        pass
+
+# proxy_url → _PersistentSession (같은 프록시를 쓰는 모든 봇 스레드가 TCP/TLS 커넥션 풀을 공유)
+# 인증은 요청마다 서명 헤더로 하므로 세션에 유저별 상태가 없음 (쿠키는 아예 저장하지 않음)
+_SESSIONS = {}
+_SESSIONS_LOCK = Lock()
+
+def _get_session(proxy_url=None):
+    with _SESSIONS_LOCK:
+        sess = _SESSIONS.get(proxy_url)
+        if sess is None:
+            sess = _PersistentSession()
+            sess.trust_env = False  # ccxt 기본값과 동일 (환경변수 프록시 무시)
+            sess.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))  # 유저 간 쿠키 공유 방지
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=64)
+            sess.mount('https://', adapter)
+            sess.mount('http://', adapter)
+            _SESSIONS[proxy_url] = sess
+    return sess
+
 def _get_exchange(exchange_name, api_key, api_secret):
     if exchange_name == "bingx":
         ex = ccxt.bingx({
@@ -172,14 +280,17 @@ def _get_exchange(exchange_name, api_key, api_secret):
             "enableRateLimit": True,
             "options": {"defaultType": "contract", "category": "linear"},
         })
-    ex.load_markets()
+    _load_markets_cached(ex)
     return ex
 
+# _bot_tag 고유값: 프로세스 내 단조 증가 카운터 + 프로세스(재시작)마다 다른 랜덤 base
+_TAG_COUNTER = itertools.count()
+_TAG_BASE = secrets.token_hex(3)
+
 def _bot_tag(user_id: int, purpose: str):
     # Legacy function - kept for compatibility
     # New code should use build_idempotent_tag()
-    import time, random
-    return f"BOT_{purpose}_{user_id}_{int(time.time()*1000)}_{random.randint(100,999)}"
+    return f"BOT_{purpose}_{user_id}_{next(_TAG_COUNTER)}_{_TAG_BASE}"
 
 def build_idempotent_tag(user_id: int, symbol: str, purpose: str, leg_index: int = None) -> str:
     """
@@ -205,6 +316,38 @@ def build_idempotent_tag(user_id: int, symbol: str, purpose: str, leg_index: int
         # Fallback for other purposes
         return f"sm_{purpose}_{user_id}_{symbol_no_sep}"
 
+# Propagate tag to ALL possible CCXT order fields for maximum compatibility
+_TAG_PARAM_KEYS = (
+    'text',
+    'clientOrderId',
+    'clientOrderID',     # Alternative spelling
+    'newClientOrderId',  # For order amendments
+    'orderLinkId',       # Bybit-specific
+    'label',             # Some exchanges use this
+)
+
+@functools.lru_cache(maxsize=64)
+def _order_params_template(ex, position_side, is_tp, is_sl, hedge_mode):
+    """build_params_for_exchange의 태그 외 파라미터 (캐시되므로 반환값을 수정하지 말 것)"""
+    p = {}
+
+    # Position side for hedge mode exchanges
+    if position_side:
+        p['positionSide'] = position_side  # 'LONG' | 'SHORT'
+
+    # reduceOnly handling for TP/SL orders
+    if ex == 'bingx' and hedge_mode:
+        # BingX Hedge mode error (109400) prevention: no reduceOnly
+        pass
+    else:
+        # Most exchanges need reduceOnly=True for TP/SL orders
+        if is_tp or is_sl:
+            p['reduceOnly'] = True
+
+    # Default time in force
+    p['timeInForce'] = 'GTC'
+    return p
+
 def build_params_for_exchange(ex, *, tag, position_side=None, is_tp=False, is_sl=False, hedge_mode=False):
     """
     Build exchange-specific order parameters with idempotent tag propagation.
@@ -224,73 +367,82 @@ def build_params_for_exchange(ex, *, tag, position_side=None, is_tp=False, is_sl
     Returns:
         Dict of parameters to pass to exchange order creation
     """
-    p = {}
-
-    # Propagate tag to ALL possible CCXT order fields for maximum compatibility
-    p['text'] = tag
-    p['clientOrderId'] = tag
-    p['clientOrderID'] = tag  # Alternative spelling
-    p['newClientOrderId'] = tag  # For order amendments
-    p['orderLinkId'] = tag  # Bybit-specific
-    p['label'] = tag  # Some exchanges use this
-
-    # Position side for hedge mode exchanges
-    if position_side:
-        p['positionSide'] = position_side.upper()  # 'LONG' | 'SHORT'
+    # 태그 외 값은 (ex, position_side, is_tp, is_sl, hedge_mode)로만 결정 → 템플릿 재사용
+    p = dict.fromkeys(_TAG_PARAM_KEYS, tag)
+    p.update(_order_params_template(ex, position_side.upper() if position_side else None, is_tp, is_sl, hedge_mode))
+    return p
 
-    # reduceOnly handling for TP/SL orders
-    if ex == 'bingx' and hedge_mode:
-        # BingX Hedge mode error (109400) prevention: no reduceOnly
-        p.pop('reduceOnly', None)
-    else:
-        # Most exchanges need reduceOnly=True for TP/SL orders
-        if is_tp or is_sl:
-            p['reduceOnly'] = True
+# 봇 태그 검사 대상 필드 (표준/상위 → info 쪽 거래소 원문)
+_BOT_TAG_ORDER_FIELDS = (
+    'text', 'clientOrderId', 'clientOrderID', 'newClientOrderId', 'orderLinkId',
+    'orderID', 'id', 'origClientOrderId', 'label',
+)
+_BOT_TAG_INFO_FIELDS = (
+    'text', 'clientOrderId', 'clientOrderID', 'newClientOrderId', 'origClientOrderId',
+    'orderLinkId', 'orderID', 'id', 'cOid', 'client_oid', 'clientOrderNo', 'label',
+)
+# 우리 태그 컨벤션이 BOT_... 이므로 대소문자 무시 'BOT' 접두사 매치가 가장 안전
+_BOT_TAG_RE = re.compile(r'bot', re.IGNORECASE)
 
-    # Default time in force
-    p.setdefault('timeInForce', 'GTC')
-    return p
+# _register_order / _is_known_order 가 보는 키 (거래소 order id → client id/태그)
+_KNOWN_ORDER_KEYS = (
+    'id', 'orderId', 'orderID',
+    'clientOrderId', 'clientOrderID', 'newClientOrderId', 'orderLinkId', 'label', 'text',
+)
 
 def _is_bot_tagged(order_obj) -> bool:
     try:
-        info = order_obj.get('info') or {}
-        fields = [
-            # 표준/상위
-            order_obj.get('text') or '',
-            order_obj.get('clientOrderId') or '',
-            order_obj.get('clientOrderID') or '',
-            order_obj.get('newClientOrderId') or '',
-            order_obj.get('orderLinkId') or '',
-            order_obj.get('orderID') or '',
-            order_obj.get('id') or '',
-            order_obj.get('origClientOrderId') or '',
-            order_obj.get('label') or '',
-
-            # info 쪽(거래소 원문)
-            info.get('text') or '',
-            info.get('clientOrderId') or '',
-            info.get('clientOrderID') or '',
-            info.get('newClientOrderId') or '',
-            info.get('origClientOrderId') or '',
-            info.get('orderLinkId') or '',
-            info.get('orderID') or '',
-            info.get('id') or '',
-            info.get('cOid') or '',
-            info.get('client_oid') or '',
-            info.get('clientOrderNo') or '',
-            info.get('label') or '',
-        ]
-        up = [str(x).upper() for x in fields if x]
-        # 우리 태그 컨벤션이 BOT_... 이므로 startswith('BOT')가 가장 안전
-        return any(s.startswith('BOT') for s in up)
+        match = _BOT_TAG_RE.match
+        for k in _BOT_TAG_ORDER_FIELDS:
+            v = order_obj.get(k)
+            if v and match(str(v)):
+                return True
+        info = order_obj.get('info') or _EMPTY
+        for k in _BOT_TAG_INFO_FIELDS:
+            v = info.get(k)
+            if v and match(str(v)):
+                return True
+        return False
     except Exception:
         return False
 
+# 배치 취소 1회당 최대 주문 수 (bybit v5 batch cancel 한도)
+CANCEL_BATCH_SIZE = 10
+
+def _cancel_orders_batch(ex, ids, symbol, params):
+    """
+    주문 여러 개 취소: 거래소가 cancelOrders(배치)를 지원하면 묶어서 호출,
+    아니면(또는 배치 실패 시) cancel_order를 병렬로 호출. 마지막 에러(없으면 None) 반환
+    """
+    last_error = None
+    pending = list(ids)
+    if pending and ex.has.get('cancelOrders'):
+        failed = []
+        for i in range(0, len(pending), CANCEL_BATCH_SIZE):
+            chunk = pending[i:i + CANCEL_BATCH_SIZE]
+            try:
+                ex.cancel_orders(chunk, symbol, params=params)
+            except Exception as e:
+                last_error = e
+                failed.extend(chunk)
+        pending = failed
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+            futures = [pool.submit(ex.cancel_order, oid, symbol, params=params) for oid in pending]
+            for f in futures:
+                try:
+                    f.result()
+                except Exception as ce:
+                    last_error = ce
+    return last_error
+
 def cancel_all_open_orders_hard(ex, symbol, params=None, max_wait=10, retries=3):
-    import time
     params = params or {}
     last_error = None
 
+    def _open():
+        return ex.fetch_open_orders(symbol, params=params) or []
+
     try:
         if hasattr(ex, 'cancel_all_orders'):
             ex.cancel_all_orders(symbol, params=params)
@@ -299,34 +451,45 @@ def cancel_all_open_orders_hard(ex, symbol, params=None, max_wait=10, retries=3)
     except Exception as e:
         last_error = e
 
-    t0 = time.time()
-    while time.time() - t0 < max_wait:
+    # 한 번 조회한 미체결 목록(remaining)으로 완료 확인과 다음 재시도 취소 대상을 함께 처리
+    # (None = 마지막 조회 실패 → 다시 조회 필요)
+    remaining = None
+    deadline = time.monotonic() + max_wait
+    while True:
         try:
-            if not (ex.fetch_open_orders(symbol, params=params) or []):
-                return True
-            time.sleep(0.5)
+            remaining = _open()
         except Exception as e:
             last_error = e
+            remaining = None
+            break
+        if not remaining:
+            return True
+        if time.monotonic() + 0.5 >= deadline:
             break
+        time.sleep(0.5)
 
     delay = 0.5
     for _ in range(retries):
         try:
-            for od in (ex.fetch_open_orders(symbol, params=params) or []):
-                try:
-                    ex.cancel_order(od['id'], symbol, params=params)
-                except Exception as ce:
-                    last_error = ce
+            if remaining is None:
+                remaining = _open()
+                if not remaining:
+                    return True
+            last_error = _cancel_orders_batch(ex, [od['id'] for od in remaining], symbol, params) or last_error
+            remaining = None
             time.sleep(delay)
             delay = min(delay * 2, 4.0)
-            if not (ex.fetch_open_orders(symbol, params=params) or []):
+            remaining = _open()
+            if not remaining:
                 return True
         except Exception as e:
             last_error = e
             time.sleep(delay)
             delay = min(delay * 2, 4.0)
+    if remaining is not None:
+        return False  # 방금 조회한 목록에 아직 주문이 남아 있음
     try:
-        return len(ex.fetch_open_orders(symbol, params=params) or []) == 0
+        return len(_open()) == 0
     except Exception:
         return False
 
@@ -348,6 +511,7 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
         retry_count = 0
 
         while retry_count < max_retries:
+            position_feed = None
             try:
                 # 1) 초기 상태
                 if 'repeat' not in config or not config['repeat']:
@@ -391,31 +555,60 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                     raise Exception(f"지원하지 않는 거래소: {exchange_name}")
 
                 exchange = exchange_class(exchange_kwargs)
-                exchange.load_markets()
+                # 재시도/다른 유저 봇과 TCP/TLS 연결 재사용 (프로세스 공용 세션)
+                exchange.session = _get_session((exchange_kwargs.get('proxies') or {}).get('https'))
+                _load_markets_cached(exchange)
 
                 # 3) 마켓/심볼/정밀도
-                futures_markets = {
-                    k: v for k, v in exchange.markets.items()
-                    if (v.get('contract') or v.get('future') or v.get('swap'))
-                    and v.get('quote') == 'USDT'
-                    and ('swap' in v.get('type', '').lower() or 'perpetual' in v.get('type', '').lower())
-                }
+                futures_markets = _futures_markets(exchange)
                 symbol = normalize_symbol(config['symbol'], futures_markets)
                 market = futures_markets[symbol]
 
-                # 수량/가격 정밀 처리 함수
-                def _amt(ex, sym, raw):
+                # 포지션/시세는 웹소켓 푸시 캐시에서 읽고 REST는 fallback/주문용으로만 사용
+                position_feed = PositionFeed(exchange_name, exchange_kwargs, symbol, markets=exchange.markets)
+                if not position_feed.start():
+                    logging.info(f"[{user_id}] ccxt.pro 미사용 → REST 폴링으로 포지션 조회")
+
+                def _fetch_pos():
+                    hit, p = position_feed.get_position(side)
+                    if hit:
+                        return _norm_pos(p)
+                    p = get_position(exchange, symbol, side, position_idx if use_position_idx else None)
+                    position_feed.update_from_rest(side, p)
+                    return _norm_pos(p)
+
+                # 수량/가격 정밀 처리 함수 (정밀도는 심볼당 1회 해석한 MarketSpec 사용, ccxt 범용 경로는 fallback)
+                spec = market_spec(exchange, symbol)
+
+                def _amt(raw):
+                    # amount_to_precision과 동일하게 내림(TRUNCATE), 0이 되면 ccxt처럼 예외 경로와 같은 값
+                    q = spec.amount(raw)
+                    if q is not None:
+                        return q
+                    if spec.amt_step is not None:
+                        return float(f"{raw:.8f}")
                     try:
-                        return float(ex.amount_to_precision(sym, raw))
+                        return float(exchange.amount_to_precision(symbol, raw))
                     except Exception:
                         return float(f"{raw:.8f}")
 
-                def _px(ex, sym, raw):
+                def _px(raw):
+                    # price_to_precision과 동일하게 반올림(ROUND)
+                    q = spec.price(raw)
+                    if q is not None:
+                        return q
+                    if spec.px_step is not None:
+                        return float(f"{raw:.8f}")
                     try:
-                        return float(ex.price_to_precision(sym, raw))
+                        return float(exchange.price_to_precision(symbol, raw))
                     except Exception:
                         return float(f"{raw:.8f}")
 
+                # 틱 사이즈 (Guard 허용오차 / TP·SL 갱신 임계값) - 루프 밖에서 1회 계산
+                tick_size = spec.tick
+                tp_sl_tol = max(tick_size * 5, 0.0)
+                price_update_threshold = max(tick_size * 2, 0.0)
+
                 # 레버리지
                 leverage = int(config.get('leverage', 15))
                 try:
@@ -435,11 +628,13 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
 
                 # 4) 전략 파라미터
                 grids = config['grids']                       # [{'amount':..,'gap':..}, ...]
+                # 설정값은 재시도마다 1회만 파싱 → 메인 루프에서는 로컬 값 사용
+                tp_raw = config.get('take_profit', '0%')      # ensure_tp_exists용 원래 설정값
                 tp = float(str(config.get('take_profit','0')).replace('%','') or 0) / 100 / leverage
                 sl = float(str(config.get('stop_loss', '0')).replace('%','') or 0) / 100 / leverage
+                repeat_enabled = config.get('repeat', True)   # stop_repeat 오버라이드 시에만 변경
                 rounds = int(config['rounds'])
-                limits_amount = (market.get('limits', {}) or {}).get('amount', {}) or {}
-                min_qty = float(limits_amount.get('min') or 0.0)
+                min_qty = spec.min_qty
 
                 # bybit용 공통 params
                 trade_params = {'positionIdx': position_idx} if use_position_idx else {}
@@ -448,10 +643,31 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                 
                 hard_cancel_params = dict(trade_params) if trade_params else {}
 
+                # 진입/그리드 주문 공통 params (주문마다 client id만 추가해서 사용)
+                base_order_params = {'text': 'BOT_ORDER'}
+                if use_position_idx:
+                    base_order_params['positionIdx'] = position_idx
+                if exchange_name == 'bingx':
+                    base_order_params['positionSide'] = 'LONG' if side == 'long' else 'SHORT'
+                    cid_key = 'clientOrderId'
+                else:
+                    base_order_params['reduceOnly'] = False
+                    cid_key = 'orderLinkId'
+
+                # 그리드 회차별 (투자금, 기준가 배수) — 설정은 재시도 동안 고정이므로 1회만 계산
+                grid_plan = [
+                    (float(g['amount']), (1 - float(g['gap']) / 100.0) if side == 'long' else (1 + float(g['gap']) / 100.0))
+                    for g in grids[1:rounds]
+                ]
+
                 # 6) Guard(외부개입 감시) 초기화
                 GUARD_INTERVAL = 5.0
                 guard_last_check = 0.0
-                guard_snooze_until = time.time() + 10  # 시작 직후 10초 유예
+                # 기대 TP/SL 가격은 평단이 바뀔 때만 재계산 (Guard 틱마다 반복 계산 방지)
+                exp_entry = None
+                exp_tp = exp_sl = None
+                # 스누즈/락/쿨다운은 monotonic 기준 (NTP 보정에 영향 없음), 거래소 타임스탬프 비교만 wall clock
+                guard_snooze_until = time.monotonic() + 10  # 시작 직후 10초 유예
                 SAFETY_STOP_MSG = "⛔ 안전정지: 외부 개입(미인식 체결/주문) 감지. 봇을 중단합니다."
                 bot_start_ms = int(time.time() * 1000)
 
@@ -460,48 +676,66 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                 last_entry_price = 0.0
                 last_size = 0.0
                 last_tp_sl_avg_price = None
+                last_tp_sl_size = 0.0          # 마지막 TP/SL 배치 시 수량
+                last_tp_sl_refresh_at = 0.0    # 마지막 TP/SL 배치 시각 (monotonic)
+                TP_SL_MIN_REFRESH = 5.0        # (G) 갱신 최소 간격(초) → 취소/재주문 폭주 방지
                 initial_entry_lock_until = 0.0
                 initial_entry_sent_at = 0.0
-                known_order_ids = set()  
-                known_client_ids = set()  
-                known_tags = set()   
+                known_ids = set()   # 내가 만든 주문의 거래소 id + client id/태그
 
                 status = "봇 진행중"
 
                 def _register_order(order_obj):
                     if not order_obj:
                         return
-                    info = order_obj.get('info') or {}
-                    # exchange order ids
-                    for k in ('id', 'orderId', 'orderID'):
-                        v = order_obj.get(k) or info.get(k)
-                        if v: known_order_ids.add(str(v))
-                    # client ids / tags
-                    for k in ('clientOrderId','clientOrderID','newClientOrderId','orderLinkId','label','text'):
+                    info = order_obj.get('info') or _EMPTY
+                    for k in _KNOWN_ORDER_KEYS:
                         v = order_obj.get(k) or info.get(k)
                         if v:
-                            s = str(v)
-                            known_client_ids.add(s)
-                            if s.upper().startswith('BOT'):
-                                known_tags.add(s)
+                            known_ids.add(str(v))
 
                 def _is_known_order(order_obj):
-                    info = order_obj.get('info') or {}
-                    for k in ('id','orderId','orderID'):
-                        v = order_obj.get(k) or info.get(k)
-                        if v and str(v) in known_order_ids:
-                            return True
-                    for k in ('clientOrderId','clientOrderID','newClientOrderId','orderLinkId','label','text'):
+                    info = order_obj.get('info') or _EMPTY
+                    for k in _KNOWN_ORDER_KEYS:
                         v = order_obj.get(k) or info.get(k)
-                        if v and str(v) in known_client_ids:
-                            return True
-                    # 태그 문자열만 살아있을 수도 있음
-                    for k in ('clientOrderId','clientOrderID','newClientOrderId','orderLinkId','label','text'):
-                        v = order_obj.get(k) or info.get(k)
-                        if v and str(v).upper().startswith('BOT'):
-                            return True
+                        if v:
+                            v = str(v)
+                            # 등록된 id/client id 이거나, 태그 문자열만 살아있는 경우
+                            if v in known_ids or _BOT_TAG_RE.match(v):
+                                return True
                     return False
 
+                tp_sl_ids = {}   # 현재 살아있는 내 TP/SL 주문 id ('tp'/'sl') → 갱신 시 amend 대상
+
+                def _place_tp_sl(entry, amount):
+                    # TP+SL을 (가능하면) 일괄 주문 1회로 배치하고 내 주문으로 등록
+                    tp_res, sl_res = place_manual_tp_sl_orders(
+                        exchange, symbol, ccxt_side, entry, tp, sl, amount, side,
+                        position_idx if use_position_idx else None, exchange_name)
+                    if tp > 0 and tp_res: _register_order(tp_res)
+                    if sl_res: _register_order(sl_res)
+                    tp_sl_ids['tp'] = (tp_res or _EMPTY).get('id')
+                    tp_sl_ids['sl'] = (sl_res or _EMPTY).get('id')
+
+                def _replace_tp_sl(entry, amount):
+                    # 기존 TP/SL을 가격/수량만 수정(amend), 안 되면 취소 후 재주문
+                    res = amend_tp_sl_orders(
+                        exchange, symbol, ccxt_side, entry, tp, sl, amount, side,
+                        tp_sl_ids.get('tp'), tp_sl_ids.get('sl'),
+                        position_idx if use_position_idx else None, exchange_name)
+                    if res:
+                        for k, o in zip(('tp', 'sl'), res):
+                            if o:
+                                _register_order(o)
+                                tp_sl_ids[k] = o.get('id') or tp_sl_ids.get(k)   # BingX는 새 주문 id
+                        return
+                    tp_sl_ids.clear()
+                    if use_position_idx:
+                        cancel_tp_sl_orders(exchange, symbol, position_idx)
+                    else:
+                        cancel_tp_sl_orders(exchange, symbol)
+                    _place_tp_sl(entry, amount)
+
                 def _near(a, b, tol):
                     try:
                         return abs(float(a) - float(b)) <= float(tol)
@@ -524,14 +758,14 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                         exchange=exchange,
                         symbol=symbol,
                         side=side,  # 'long' | 'short'
-                        take_profit=config.get('take_profit', '0%'),  # 원래 설정값 그대로
+                        take_profit=tp_raw,  # 원래 설정값 그대로
                         position_idx=position_idx if use_position_idx else None,
                         exchange_name=exchange_name,
                         leverage=leverage,
                     )
                     if tp_res:
                         _register_order(tp_res)   # ✅ 새로 만든 TP를 '내가 만든 주문'으로 등록
-                    guard_snooze_until = time.time() + 15
+                    guard_snooze_until = time.monotonic() + 15
 
                 except Exception as e:
                     logging.warning(f"[ensure_tp_exists @startup] {e}")
@@ -557,7 +791,7 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                 while not stop_event.is_set():
                     try:
                         # ✅ (0) 명령 처리 및 heartbeat 업데이트
-                        current_time = time.time()
+                        current_time = time.monotonic()
                         if current_time - last_heartbeat_time > heartbeat_interval:
                             command_processor.update_heartbeat()
                             last_heartbeat_time = current_time
@@ -597,6 +831,8 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
 
                             logging.info(f"[{user_id}] [{'CONT' if fr else 'SINGLE'}_REFRESH] 강제 주문 초기화")
                             entry_orders_sent = False
+                            tp_sl_ids.clear()           # 방금 모두 취소됨 → 다음 갱신은 amend 대신 재주문
+                            position_feed.invalidate()  # 새로고침 시 포지션은 REST로 재확인
                             if sr:
                                 single_refresh_flags[user_id] = False
                                 
@@ -605,7 +841,7 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                     exchange=exchange,
                                     symbol=symbol,
                                     side=side,
-                                    take_profit=config.get('take_profit', '0%'),
+                                    take_profit=tp_raw,
                                     position_idx=position_idx if use_position_idx else None,
                                     exchange_name=exchange_name,
                                     leverage=leverage,  
@@ -615,25 +851,26 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                             except Exception as e:
                                 logging.warning(f"[ensure_tp_exists @refresh] {e}")
 
-                            guard_snooze_until = time.time() + 15  # ✅ 오탐 방지
+                            guard_snooze_until = time.monotonic() + 15  # ✅ 오탐 방지
 
                         # stop_repeat 오버라이드 → 반복 해제되고 Guard 잠깐 스누즈해 오탐 방지
                         ro = repeat_overrides.get(user_id, None)
-                        if ro is False and config.get('repeat', True):
-                            config['repeat'] = False
-                            guard_snooze_until = time.time() + 15  # 관리 페이지에서 누른 직후 오탐 방지
-
-                        # (C) 포지션 조회
-                        pos = get_position(exchange, symbol, side, position_idx if use_position_idx else None)
-                        size = float(pos['contracts']) if pos else 0.0
+                        if ro is False and repeat_enabled:
+                            config['repeat'] = repeat_enabled = False
+                            guard_snooze_until = time.monotonic() + 15  # 관리 페이지에서 누른 직후 오탐 방지
+
+                        # (C) 포지션 조회 (조회 전 기준점 → 조회 이후의 포지션 변경만 대기 해제에 사용)
+                        pos_seq = position_feed.position_seq()
+                        pos = _fetch_pos()
+                        size = pos['contracts'] if pos else 0.0
                         if pos:
-                            last_entry_price = float(pos.get('entryPrice', 0) or 0)
-                            last_size = float(pos.get('contracts', 0) or 0)
+                            last_entry_price = pos['entryPrice']
+                            last_size = size
 
                             
                         # (B) 외부개입 감시 (repeat일 때만)
-                        now_ts = time.time()
-                        guard_enabled = (now_ts >= guard_snooze_until) and config.get('repeat', True)
+                        now_ts = time.monotonic()
+                        guard_enabled = (now_ts >= guard_snooze_until) and repeat_enabled
                         if guard_enabled and (now_ts - guard_last_check) >= GUARD_INTERVAL:
                             guard_last_check = now_ts
                             try:
@@ -643,26 +880,26 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                 if use_position_idx:
                                     open_params.setdefault('positionIdx', position_idx)
 
-                                # tick_size 계산 (market에서)
-                                precision_price = (market.get('precision', {}) or {}).get('price', None)
-                                if isinstance(precision_price, (int, float)) and precision_price is not None:
-                                    tick_size = float(precision_price) if (0 < precision_price < 1) else 10 ** (-int(precision_price))
-                                else:
-                                    tick_size = float((market.get('limits', {}) or {}).get('price', {}).get('min') or 0.0) or 0.00001
-                                tp_sl_tol = max(tick_size * 5, 0.0)
-
                                 # 기대 TP/SL 가격
-                                curr_entry = float(pos['entryPrice']) if pos else 0.0
-                                exp_tp = None
-                                exp_sl = None
-                                if tp and tp > 0 and curr_entry > 0:
-                                    exp_tp = curr_entry * (1 + tp) if side == 'long' else curr_entry * (1 - tp)
-                                if sl and sl > 0 and curr_entry > 0:
-                                    exp_sl = curr_entry * (1 - sl) if side == 'long' else curr_entry * (1 + sl)
+                                curr_entry = pos['entryPrice'] if pos else 0.0
+                                if curr_entry != exp_entry:
+                                    exp_entry = curr_entry
+                                    exp_tp = None
+                                    exp_sl = None
+                                    if tp and tp > 0 and curr_entry > 0:
+                                        exp_tp = curr_entry * (1 + tp) if side == 'long' else curr_entry * (1 - tp)
+                                    if sl and sl > 0 and curr_entry > 0:
+                                        exp_sl = curr_entry * (1 - sl) if side == 'long' else curr_entry * (1 + sl)
 
                                 open_orders = exchange.fetch_open_orders(symbol, params=open_params) or []
+                                # 거래소 id가 이미 등록된 주문은 한 번에 걸러내고, 나머지만 아래 상세 검사
+                                # (평상시엔 전부 내 주문이라 상세 검사 루프가 돌지 않음)
+                                residual = [
+                                    o for o in open_orders
+                                    if str(o.get('id') or (o.get('info') or _EMPTY).get('orderId') or '') not in known_ids
+                                ]
                                 unknown_orders = []
-                                for o in open_orders:
+                                for o in residual:
                                     # 1) 우리가 등록한 주문이면 패스
                                     if _is_known_order(o):
                                         continue
@@ -670,9 +907,12 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                     if _is_bot_tagged(o):
                                         continue
 
-                                    inf = o.get('info') or {}
+                                    inf = o.get('info') or _EMPTY
                                     ts = (o.get('timestamp') or inf.get('createdTime') or inf.get('ctime') or
                                         inf.get('time') or inf.get('updateTime'))
+                                    # 생성 시각을 모르면 판단 불가 → 패스 (가격 비교보다 먼저: 결과는 같고 더 싸다)
+                                    if ts is None:
+                                        continue
 
                                     # 3) 태그가 없어도 가격이 기대 TP/SL 근처면 허용
                                     o_price = o.get('price') or inf.get('price') or inf.get('stopPrice')
@@ -681,9 +921,6 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                         (exp_sl and _near(o_price, exp_sl, tp_sl_tol))
                                     ):
                                         continue
-
-                                    if ts is None:
-                                        continue
                                     try:
                                         if int(ts) >= bot_start_ms:
                                             unknown_orders.append(o)
@@ -709,7 +946,9 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                         if size == 0 and last_size > 0:
                             time.sleep(3)
                             pos_retry = get_position(exchange, symbol, side, position_idx if use_position_idx else None)
-                            retry_size = float(pos_retry['contracts']) if pos_retry else 0.0
+                            position_feed.update_from_rest(side, pos_retry)
+                            pos_retry = _norm_pos(pos_retry)
+                            retry_size = pos_retry['contracts'] if pos_retry else 0.0
                             if retry_size == 0:
                                 status = "포지션 종료"
                                 # 모든 주문 취소
@@ -754,10 +993,10 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                         )
                                     else:  # bybit
                                         bal = exchange.fetch_balance({'type': 'unified'})
-                                        equity = 0.0
-                                        for acc in bal.get('info', {}).get('result', {}).get('list', []):
-                                            for c in acc.get('coin', []):
-                                                equity += float(c.get('usdValue', 0) or 0)
+                                        # 계정(list) × 코인 이중 루프를 한 번의 제너레이터 합으로
+                                        coins = (c for acc in bal.get('info', {}).get('result', {}).get('list', [])
+                                                 for c in acc.get('coin', ()))
+                                        equity = math.fsum(float(c.get('usdValue') or 0) for c in coins)
                                     equity_text = f"{equity:.2f} USDT"
                                 except Exception:
                                     equity_text = "조회 실패"
@@ -777,9 +1016,11 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                 entry_orders_sent = False
                                 last_size = 0.0
                                 last_tp_sl_avg_price = None
+                                last_tp_sl_size = 0.0
+                                tp_sl_ids.clear()
 
                                 # repeat이 꺼져 있으면 종료
-                                if not config['repeat']:
+                                if not repeat_enabled:
                                     status = "반복 정지"
                                     break
 
@@ -787,12 +1028,12 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                 continue
 
                         # (E) 최초 진입
-                        now = time.time()
+                        now = time.monotonic()
                         if now < initial_entry_lock_until:
                             time.sleep(1)
                             continue
 
-                        if not pos or float(pos.get('contracts', 0) or 0) == 0:
+                        if not pos or pos['contracts'] == 0:
                             if not cancel_all_open_orders_hard(exchange, symbol, params=hard_cancel_params):
                                 logging.warning("[진입 전] open orders 정리가 완전하지 않아 진입 보류")
                                 time.sleep(3)
@@ -802,11 +1043,10 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                 time.sleep(1)
                                 continue
 
-                            ticker = exchange.fetch_ticker(symbol)
-                            market_price = float(ticker['last'])
+                            market_price = position_feed.last_price() or float(exchange.fetch_ticker(symbol)['last'])
                             invest_usdt = float(grids[0]['amount'])
                             coin_qty_raw = (invest_usdt * leverage) / market_price
-                            coin_qty = _amt(exchange, symbol, coin_qty_raw)
+                            coin_qty = _amt(coin_qty_raw)
 
                             if coin_qty < min_qty:
                                 logging.error(f"❌ 주문실패: 수량 {coin_qty} < 최소수량 {min_qty}")
@@ -814,32 +1054,39 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                                               f"❌ 주문수량 {coin_qty}는 최소수량({min_qty})보다 적음.")
                                 return
 
-                            order_params = {'text': 'BOT_ORDER'}
-                            if use_position_idx:
-                                order_params['positionIdx'] = position_idx
-                            if exchange_name == 'bingx':
-                                order_params['positionSide'] = 'LONG' if side == 'long' else 'SHORT'
-                                order_params['clientOrderId'] = f"BOT_{int(time.time()*1000)}"
-                            else:
-                                order_params['reduceOnly'] = False
-                                order_params['orderLinkId'] = f"BOT_{int(time.time()*1000)}"
+                            order_params = dict(base_order_params)
+                            order_params[cid_key] = _bot_tag(user_id, 'ENTRY')
 
                             entry_res = exchange.create_order(symbol, 'market', ccxt_side, coin_qty, None, order_params)
                             _register_order(entry_res)   
-                            guard_snooze_until = time.time() + 10      # ✅ 주문 직후 오탐 방지 스누즈(조금 넉넉히)
+                            guard_snooze_until = time.monotonic() + 10      # ✅ 주문 직후 오탐 방지 스누즈(조금 넉넉히)
 
                             # 락/스누즈
-                            initial_entry_lock_until = time.time() + 8
-                            initial_entry_sent_at = time.time()                            
+                            initial_entry_lock_until = time.monotonic() + 8
+                            initial_entry_sent_at = time.monotonic()                            
 
                             # 포지션 반영 대기 (최대 8초)
+                            # 웹소켓 주문/포지션 푸시가 오면 즉시 깨어나 재확인, 피드가 없으면 1초 간격 폴링과 동일
                             filled_amount, filled_price = 0.0, 0.0
-                            for _ in range(8):
-                                time.sleep(1)
-                                pos = get_position(exchange, symbol, side, position_idx if use_position_idx else None)
-                                if pos and float(pos.get('contracts', 0) or 0) > 0:
-                                    filled_amount = float(pos['contracts'])
-                                    filled_price = float(pos['entryPrice'])
+                            entry_id = (entry_res or {}).get('id')
+                            fill_deadline = time.monotonic() + 8
+                            seq = position_feed.update_seq()
+                            while True:
+                                remaining = fill_deadline - time.monotonic()
+                                if remaining <= 0:
+                                    break
+                                position_feed.wait_for_update(seq, min(1.0, remaining))
+                                seq = position_feed.update_seq()   # 조회 전에 갱신 → 조회 중 도착한 푸시도 놓치지 않음
+                                # 진입 주문 체결 푸시가 먼저 오면 그 체결가/수량 사용 (진입 전 포지션 0이므로 동일)
+                                fill = position_feed.order_fill(entry_id) if entry_id else None
+                                if fill:
+                                    filled_amount, filled_price = fill
+                                    position_feed.invalidate()  # 포지션 푸시가 늦을 수 있으니 다음 조회는 REST
+                                    break
+                                pos = _fetch_pos()
+                                if pos and pos['contracts'] > 0:
+                                    filled_amount = pos['contracts']
+                                    filled_price = pos['entryPrice']
                                     break
 
                             if filled_amount == 0.0:
@@ -862,133 +1109,87 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
 
                             # 초기가격 기준 TP/SL 세팅
                             if filled_amount >= min_qty:
-                                if use_position_idx:
-                                    tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, filled_price, tp, filled_amount, side, position_idx, exchange_name)
-                                    if tp > 0 and tp_res: _register_order(tp_res)
-                                    if sl > 0:
-                                        sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, filled_price, sl, filled_amount, side, position_idx, exchange_name)
-                                        if sl_res: _register_order(sl_res)
-                                else:
-                                    tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, filled_price, tp, filled_amount, side, None, exchange_name)
-                                    if tp > 0 and tp_res: _register_order(tp_res)
-                                    if sl > 0:
-                                        sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, filled_price, sl, filled_amount, side, None, exchange_name)
-                                        if sl_res: _register_order(sl_res)
+                                _place_tp_sl(filled_price, filled_amount)
                                 last_tp_sl_avg_price = filled_price
+                                last_tp_sl_size = filled_amount
+                                last_tp_sl_refresh_at = time.monotonic()
 
-                            guard_snooze_until = time.time() + 15
+                            guard_snooze_until = time.monotonic() + 15
                             time.sleep(5)
                             continue
 
                         # (F) 추가 추매(그리드)
                         if not entry_orders_sent:
-                            base_price = float(pos['entryPrice'])
+                            base_price = pos['entryPrice']
                             last_entry_price = base_price
 
-                            for i in range(1, rounds):
-                                if i >= len(grids):
-                                    break
-
-                                invest_usdt = float(grids[i]['amount'])
-                                gap = float(grids[i]['gap']) / 100.0
-
+                            # 그리드 지정가를 모두 계산한 뒤 일괄 주문(createOrders)으로 한 번에 전송
+                            grid_reqs = []
+                            for i, (invest_usdt, gap_factor) in enumerate(grid_plan, start=1):
                                 # 누적(연쇄) 기준가 적용
-                                target_price_raw = base_price * (1 - gap) if side == 'long' else base_price * (1 + gap)
-                                target_price = _px(exchange, symbol, target_price_raw)
+                                target_price_raw = base_price * gap_factor
+                                target_price = _px(target_price_raw)
 
                                 grid_qty_raw = (invest_usdt * leverage) / target_price
-                                grid_qty = _amt(exchange, symbol, grid_qty_raw)
+                                grid_qty = _amt(grid_qty_raw)
                                 if grid_qty < min_qty:
                                     continue
 
-                                grid_order_params = {'text': 'BOT_ORDER'}
-                                if use_position_idx:
-                                    grid_order_params['positionIdx'] = position_idx
-                                if exchange_name == 'bingx':
-                                    grid_order_params['positionSide'] = 'LONG' if side == 'long' else 'SHORT'
-                                    grid_order_params['clientOrderId'] = f"BOT_GRID_{i}_{int(time.time()*1000)}"
-                                else:
-                                    grid_order_params['reduceOnly'] = False
-                                    grid_order_params['orderLinkId'] = f"BOT_GRID_{i}_{int(time.time()*1000)}"
+                                grid_order_params = dict(base_order_params)
+                                grid_order_params[cid_key] = _bot_tag(user_id, f'GRID_{i}')
 
-                                res = exchange.create_order(symbol, 'limit', ccxt_side, grid_qty, target_price, grid_order_params)
-                                _register_order(res)   # ✅ 추가
+                                grid_reqs.append({'symbol': symbol, 'type': 'limit', 'side': ccxt_side,
+                                                  'amount': grid_qty, 'price': target_price, 'params': grid_order_params})
                                 
                                 # 다음 회차는 방금 계산한 가격을 기준으로 이어서 계산
                                 base_price = target_price
 
+                            for res in create_orders_batched(exchange, grid_reqs):
+                                _register_order(res)   # ✅ 추가
+
                             entry_orders_sent = True
                             time.sleep(2)
 
                             # 그리드가 체결되어 평균단가/수량이 커졌으면 TP/SL 재설정
-                            new_pos = get_position(exchange, symbol, side, position_idx if use_position_idx else None)
+                            new_pos = _fetch_pos()
                             if new_pos:
-                                ne = float(new_pos['entryPrice'])
-                                sz = float(new_pos['contracts'])
+                                ne = new_pos['entryPrice']
+                                sz = new_pos['contracts']
                                 if sz > last_size and sz >= min_qty:
-                                    if use_position_idx:
-                                        cancel_tp_sl_orders(exchange, symbol, position_idx)
-                                        tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, ne, tp, sz, side, position_idx, exchange_name)
-                                        if tp > 0 and tp_res: _register_order(tp_res)
-                                        if sl > 0:
-                                            sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, ne, sl, sz, side, position_idx, exchange_name)
-                                            if sl_res: _register_order(sl_res)
-                                    else:
-                                        cancel_tp_sl_orders(exchange, symbol)
-                                        tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, ne, tp, sz, side, None, exchange_name)
-                                        if tp > 0 and tp_res: _register_order(tp_res)
-                                        if sl > 0:
-                                            sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, ne, sl, sz, side, None, exchange_name)
-                                            if sl_res: _register_order(sl_res)
+                                    _replace_tp_sl(ne, sz)
                                     try:
                                         send_telegram(config['telegram_token'], config['telegram_chat_id'],
                                                       f"🟢 추가 진입 @ {ne:.4f} contracts={sz}")
                                     except Exception:
                                         pass
                                     last_tp_sl_avg_price = ne
-                                    guard_snooze_until = time.time() + 15
+                                    last_tp_sl_size = sz
+                                    last_tp_sl_refresh_at = time.monotonic()
+                                    guard_snooze_until = time.monotonic() + 15
                                 last_size = sz
 
                         # (G) TP/SL 갱신(평균단가 변동 시)
-                        current_entry = float(pos['entryPrice'])
-                        sz = float(pos['contracts'])
-                        # 티크사이즈 2틱 이상 차이날 때만 갱신 (너무 잦은 취소 방지)
-                        precision_price = (market.get('precision', {}) or {}).get('price', None)
-                        if isinstance(precision_price, (int, float)) and precision_price is not None:
-                            if precision_price > 0 and precision_price < 1:
-                                # 혹시 ccxt 버전에 따라 price_precision이 0.0001 같은 실수로 오는 경우
-                                tick_size = float(precision_price)
-                            else:
-                                # 대부분은 '자릿수' 정수로 옴 → 틱사이즈로 변환
-                                tick_size = 10 ** (-int(precision_price))
-                        else:
-                            tick_size = float((market.get('limits', {}) or {}).get('price', {}).get('min') or 0.0) or 0.00001
-
-                        price_update_threshold = max(tick_size * 2, 0.0)
-
-                        if sz > 0 and tp > 0 and (last_tp_sl_avg_price is None or abs(current_entry - last_tp_sl_avg_price) > price_update_threshold):
-                            if use_position_idx:
-                                cancel_tp_sl_orders(exchange, symbol, position_idx)
-                                tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, current_entry, tp, sz, side, position_idx, exchange_name)
-                                if tp > 0 and tp_res: _register_order(tp_res)
-                                if sl > 0:
-                                    sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, current_entry, sl, sz, side, position_idx, exchange_name)
-                                    if sl_res: _register_order(sl_res)
-                            else:
-                                cancel_tp_sl_orders(exchange, symbol)
-                                tp_res = place_manual_tp_order(exchange, symbol, ccxt_side, current_entry, tp, sz, side, None, exchange_name)
-                                if tp > 0 and tp_res: _register_order(tp_res)
-                                if sl > 0:
-                                    sl_res = place_manual_sl_order(exchange, symbol, ccxt_side, current_entry, sl, sz, side, None, exchange_name)
-                                    if sl_res: _register_order(sl_res)
+                        current_entry = pos['entryPrice']
+                        sz = pos['contracts']
+                        # 티크사이즈 2틱 이상 차이나거나 수량이 늘었을 때만 갱신 (너무 잦은 취소 방지, price_update_threshold)
+                        # 수량 감소(TP 부분 체결)는 남은 TP 주문이 그대로 유효하므로 갱신하지 않음
+                        if (sz > 0 and tp > 0
+                                and (last_tp_sl_avg_price is None or sz > last_tp_sl_size
+                                     or abs(current_entry - last_tp_sl_avg_price) > price_update_threshold)
+                                and time.monotonic() - last_tp_sl_refresh_at >= TP_SL_MIN_REFRESH):
+                            _replace_tp_sl(current_entry, sz)
 
                             last_tp_sl_avg_price = current_entry
-                            guard_snooze_until = time.time() + 15
+                            last_tp_sl_size = sz
+                            last_tp_sl_refresh_at = time.monotonic()
+                            guard_snooze_until = time.monotonic() + 15
 
-                        time.sleep(10)
+                        # 다음 관리 주기까지 대기: 웹소켓으로 포지션 수량/평단 변경이 오면 즉시 깨어남 (최대 10초)
+                        position_feed.wait_for_position_change(pos_seq, 10)
 
                     except Exception as e:
-                        logging.warning(f"[Bot Loop Error] {e}", exc_info=True)
+                        # 거래소 장애 시 모든 봇이 동시에 예외 → traceback은 DEBUG 레벨에서만 포맷
+                        logger.warning("[Bot Loop Error] %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
                         try:
                             send_telegram(config['telegram_token'], config['telegram_chat_id'],
                                           f"⚠️ 반복 중 오류 발생:\n{e}")
@@ -1001,7 +1202,7 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
 
             except Exception as e:
                 retry_count += 1
-                logging.error(f"[Bot Error] user_id={user_id} - {e}", exc_info=True)
+                logger.error("[Bot Error] user_id=%s - %s", user_id, e, exc_info=logger.isEnabledFor(logging.DEBUG))
                 time.sleep(5)
                 if retry_count >= max_retries:
                     try:
@@ -1027,6 +1228,31 @@ def run_bot(config, stop_event: Event, user_id: int, exchange_name='bybit'):
                     except Exception:
                         pass
                 except Exception as cleanup_error:
-                    logging.error(f"[Cleanup Error] {cleanup_error}", exc_info=True)
+                    logger.error("[Cleanup Error] %s", cleanup_error, exc_info=logger.isEnabledFor(logging.DEBUG))
+            finally:
+                if position_feed is not None:
+                    position_feed.stop()
 
-        status = "대기 중"
\ No newline at end of file
+        status = "대기 중"
+
+
+async def run_bot_async(config, stop_event: asyncio.Event, user_id: int, exchange_name='bybit'):
+    """
+    asyncio 진입점: 동기 run_bot을 이벤트 루프의 executor 스레드에서 실행.
+    asyncio.Event 중지 신호를 run_bot이 보는 threading.Event로 전달한다.
+    한 유저의 실패가 다른 유저 태스크를 취소하지 않도록 예외는 로그만 남긴다.
+    """
+    loop = asyncio.get_running_loop()
+    thread_stop = Event()
+    bot_future = loop.run_in_executor(None, run_bot, config, thread_stop, user_id, exchange_name)
+    stop_waiter = asyncio.ensure_future(stop_event.wait())
+    try:
+        await asyncio.wait({bot_future, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        thread_stop.set()
+        stop_waiter.cancel()
+
+    try:
+        await bot_future
+    except Exception as e:
+        logger.error("[Bot Error] user_id=%s - %s", user_id, e, exc_info=True)
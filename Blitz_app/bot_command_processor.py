@@ -1,11 +1,10 @@
 # Blitz_app/bot_command_processor.py
 
 import json
-import time
 import logging
 from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlalchemy import text
+from sqlalchemy import select, update
 
 from .extensions import db
 from .models import BotCommand, BotEvent, UserBot
@@ -17,9 +16,9 @@ class BotCommandProcessor:
     Process bot commands from the database with SQLite concurrency handling.
     
     Uses command claiming algorithm:
-    - BEGIN IMMEDIATE transaction
-    - SELECT oldest queued command for user
-    - UPDATE status='picked' where status='queued'
+    - read-only existence check first (idle ticks never take the SQLite write lock)
+    - single UPDATE ... RETURNING on the oldest queued command for user
+    - status='picked' only where status='queued' (no SELECT/UPDATE race)
     - COMMIT
     """
     
@@ -27,66 +26,57 @@ class BotCommandProcessor:
         self.user_id = user_id
         self.bot_instance_id = bot_instance_id
         
+    def has_queued_command(self) -> bool:
+        """Read-only check for a queued command (no write lock, unlike the claiming UPDATE)"""
+        # SQLite는 UPDATE가 매칭 행이 없어도 쓰기 락을 잡으므로, 명령이 없는 대부분의 틱은 SELECT로 끝냄
+        # 세션과 분리된 짧은 연결 사용 → 봇 세션의 ORM 객체를 만료시키지 않고 읽기 트랜잭션도 바로 종료
+        stmt = (
+            select(BotCommand.id)
+            .where(BotCommand.user_id == self.user_id, BotCommand.status == 'queued')
+            .limit(1)
+        )
+        try:
+            with db.engine.connect() as conn:
+                return conn.execute(stmt).first() is not None
+        except Exception as e:
+            logger.error(f"Failed to check queued commands: {e}")
+            return True  # 확인 실패 시 기존처럼 claim 시도
+    
     def claim_next_command(self) -> Optional[BotCommand]:
         """Claim the next available command for this user with proper concurrency"""
-        max_retries = 3
-        retry_delay = 0.1
-        
-        for attempt in range(max_retries):
+        # 가장 오래된 queued 명령을 UPDATE ... RETURNING 한 문장으로 선점
+        # (SELECT/UPDATE 사이 경합 없음, UPDATE가 쓰기 락을 원자적으로 잡으므로 BEGIN IMMEDIATE 불필요)
+        oldest_queued = (
+            select(BotCommand.id)
+            .where(BotCommand.user_id == self.user_id, BotCommand.status == 'queued')
+            .order_by(BotCommand.created_at.asc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(BotCommand)
+            .where(BotCommand.id == oldest_queued, BotCommand.status == 'queued')
+            .values(status='picked', picked_at=datetime.utcnow(), picked_by=self.bot_instance_id)
+            .returning(BotCommand)
+        )
+
+        # 락 대기는 연결마다 설정된 PRAGMA busy_timeout(config.py, 30초)이 SQLite 내부에서 처리
+        # → Python 쪽 재시도/백오프 없이 락이 풀리는 즉시 진행
+        try:
+            session = db.session()
+            command = session.execute(stmt).scalar_one_or_none()
+            # RETURNING으로 받은 행이 이미 최신 값 → 커밋 후 만료/재조회(SELECT) 생략
+            expire = session.expire_on_commit
+            session.expire_on_commit = False
             try:
-                # Use raw SQL for precise control over transaction
-                result = db.session.execute(text("""
-                    BEGIN IMMEDIATE;
-                    
-                    SELECT id FROM bot_commands 
-                    WHERE user_id = :user_id AND status = 'queued'
-                    ORDER BY created_at ASC 
-                    LIMIT 1;
-                """), {'user_id': self.user_id})
-                
-                row = result.fetchone()
-                if not row:
-                    db.session.execute(text("COMMIT;"))
-                    return None
-                
-                command_id = row[0]
-                
-                # Try to claim it
-                update_result = db.session.execute(text("""
-                    UPDATE bot_commands 
-                    SET status = 'picked', 
-                        picked_at = :now,
-                        picked_by = :instance_id
-                    WHERE id = :command_id AND status = 'queued';
-                """), {
-                    'command_id': command_id,
-                    'now': datetime.utcnow(),
-                    'instance_id': self.bot_instance_id
-                })
-                
-                db.session.execute(text("COMMIT;"))
-                
-                if update_result.rowcount > 0:
-                    # Successfully claimed, fetch the command
-                    command = BotCommand.query.get(command_id)
-                    return command
-                else:
-                    # Someone else claimed it, try again
-                    continue
-                    
-            except Exception as e:
-                try:
-                    db.session.execute(text("ROLLBACK;"))
-                except:
-                    pass
-                
-                logger.warning(f"Command claim attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (2 ** attempt))  # Exponential backoff
-                else:
-                    logger.error(f"Failed to claim command after {max_retries} attempts")
-        
-        return None
+                session.commit()
+            finally:
+                session.expire_on_commit = expire
+            return command
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to claim command: {e}")
+            return None
     
     def mark_command_done(self, command: BotCommand, success: bool = True, error_message: str = None):
         """Mark command as completed"""
@@ -95,9 +85,8 @@ class BotCommandProcessor:
             command.done_at = datetime.utcnow()
             if error_message:
                 command.error_message = error_message
-            db.session.commit()
             
-            # Log completion event
+            # Log completion event (상태 변경과 같은 트랜잭션 → 커밋/fsync 1회)
             event = BotEvent(
                 user_id=self.user_id,
                 type='command_completed',
@@ -106,12 +95,13 @@ class BotCommandProcessor:
                     'command_type': command.type,
                     'success': success,
                     'error_message': error_message
-                })
+                }, separators=(',', ':'))
             )
             db.session.add(event)
             db.session.commit()
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Failed to mark command {command.id} as done: {e}")
     
     def update_heartbeat(self):
@@ -137,6 +127,9 @@ class BotCommandProcessor:
         """
         processed = False
         
+        if not self.has_queued_command():
+            return False
+        
         while True:
             command = self.claim_next_command()
             if not command:
@@ -159,30 +152,13 @@ class BotCommandProcessor:
         """Execute a specific command"""
         payload = command.payload_dict
         
+        handler = self._HANDLERS.get(command.type)
+        if handler is None:
+            logger.warning(f"Unknown command type: {command.type}")
+            return False
+
         try:
-            if command.type == 'recover_orders':
-                return self._cmd_recover_orders(payload, bot_context)
-            elif command.type == 'restart_bot':
-                return self._cmd_restart_bot(payload, bot_context)
-            elif command.type == 'resync_tp':
-                return self._cmd_resync_tp(payload, bot_context)
-            elif command.type == 'cancel_all':
-                return self._cmd_cancel_all(payload, bot_context)
-            elif command.type == 'force_close':
-                return self._cmd_force_close(payload, bot_context)
-            elif command.type == 'reset_plan':
-                return self._cmd_reset_plan(payload, bot_context)
-            elif command.type == 'unlock':
-                return self._cmd_unlock(payload, bot_context)
-            elif command.type == 'update_rounds':
-                return self._cmd_update_rounds(payload, bot_context)
-            elif command.type == 'start_bot':
-                return self._cmd_start_bot(payload, bot_context)
-            elif command.type == 'stop_bot':
-                return self._cmd_stop_bot(payload, bot_context)
-            else:
-                logger.warning(f"Unknown command type: {command.type}")
-                return False
+            return handler(self, payload, bot_context)
                 
         except Exception as e:
             logger.error(f"Command {command.type} execution failed: {e}")
@@ -228,14 +204,31 @@ class BotCommandProcessor:
             symbol = payload.get('symbol') or bot_context.get('symbol')
             
             if exchange and symbol:
-                # Cancel all open orders
-                orders = exchange.fetch_open_orders(symbol)
-                for order in orders:
+                has = getattr(exchange, 'has', None) or {}
+                # 1) 심볼 전체 취소 API 1회 호출
+                if has.get('cancelAllOrders'):
+                    try:
+                        exchange.cancel_all_orders(symbol)
+                        logger.info(f"Cancelled all orders for {symbol}")
+                        return True
+                    except Exception as e:
+                        logger.warning(f"cancel_all_orders failed, falling back to per-order cancel: {e}")
+
+                # 2) 미체결 주문 id로 배치 취소, 미지원/실패 시 건별 취소
+                ids = [o['id'] for o in exchange.fetch_open_orders(symbol) or []]
+                if ids and has.get('cancelOrders'):
+                    try:
+                        exchange.cancel_orders(ids, symbol)
+                        logger.info(f"Cancelled {len(ids)} orders")
+                        ids = []
+                    except Exception as e:
+                        logger.warning(f"cancel_orders failed, cancelling one by one: {e}")
+                for order_id in ids:
                     try:
-                        exchange.cancel_order(order['id'], symbol)
-                        logger.info(f"Cancelled order {order['id']}")
+                        exchange.cancel_order(order_id, symbol)
+                        logger.info(f"Cancelled order {order_id}")
                     except Exception as e:
-                        logger.warning(f"Failed to cancel order {order['id']}: {e}")
+                        logger.warning(f"Failed to cancel order {order_id}: {e}")
                 
                 return True
         except Exception as e:
@@ -318,4 +311,19 @@ class BotCommandProcessor:
         
         # Set a flag in bot context to trigger shutdown
         bot_context['stop_requested'] = True
-        return True
\ No newline at end of file
+        return True
+
+
+# 명령 타입 → 핸들러 (if/elif 체인 대신 dict 조회로 분기)
+BotCommandProcessor._HANDLERS = {
+    'recover_orders': BotCommandProcessor._cmd_recover_orders,
+    'restart_bot': BotCommandProcessor._cmd_restart_bot,
+    'resync_tp': BotCommandProcessor._cmd_resync_tp,
+    'cancel_all': BotCommandProcessor._cmd_cancel_all,
+    'force_close': BotCommandProcessor._cmd_force_close,
+    'reset_plan': BotCommandProcessor._cmd_reset_plan,
+    'unlock': BotCommandProcessor._cmd_unlock,
+    'update_rounds': BotCommandProcessor._cmd_update_rounds,
+    'start_bot': BotCommandProcessor._cmd_start_bot,
+    'stop_bot': BotCommandProcessor._cmd_stop_bot,
+}
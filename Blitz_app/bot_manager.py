@@ -3,24 +3,36 @@
 import os
 import sys
 import time
-import json
 import logging
+import multiprocessing
+import select as select_mod
 import signal
-import subprocess
 import stat
 import atexit
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from threading import Thread, Event
 from typing import Any, Dict, Optional
 import psutil
+from flask import has_app_context
+from sqlalchemy import and_, func, insert, select, update
 
 from .extensions import db
 from .models import User, UserBot, BotCommand, BotEvent
 from .telegram import send_telegram
+from .json_response import odumps
+from . import manager_signal
+from .bot_runner import run as run_bot_process
 
 logger = logging.getLogger(__name__)
 
+# bot_rows를 받지 못했을 때(일괄 조회 실패 등) 개별 UserBot 조회로 대체하기 위한 표시
+_NOT_LOADED = object()
+
+
 class BotManager:
     """
     Bot Manager for supervising per-user bot processes.
@@ -39,20 +51,70 @@ class BotManager:
         self.app = app
         self.stop_event = Event()
         self.managed_bots: Dict[int, dict] = {}  # user_id -> bot_info
-        self.restart_backoff = {}  # user_id -> next_restart_time
-        self.health_check_interval = 30  # seconds
+        self.restart_backoff = {}  # user_id -> next_restart_time (time.monotonic 기준)
+        self.health_check_interval = 30  # seconds (기준 주기)
+        # 주기 대기 시간: 상태 변화가 없으면 poll_min부터 poll_backoff배씩 늘려 poll_max까지, 변화/알림이 있으면 poll_min으로
+        self.poll_min = 2
+        self.poll_max = 2 * self.health_check_interval
+        self.poll_backoff = 1.5
+        self.poll_interval = self.poll_min
+        self.heartbeat_timeout = 300  # seconds without heartbeat before a bot is considered stale
+        self._live_pids = _NOT_LOADED  # 이번 주기의 pid 집합 (주기 안에서 처음 필요할 때 한 번 생성, 주기 밖은 _NOT_LOADED)
+        self._heartbeat_cutoff = None  # 이번 주기의 stale 기준 시각 (봇마다 utcnow/timedelta 생성 방지)
         self.max_restart_attempts = 5
         self.restart_backoff_base = 60  # base backoff in seconds
+        self._restart_counts: Dict[int, int] = {}  # user_id -> UserBot.restart_count (시작 시 갱신되는 메모리 사본)
+        
+        # 활성 유저 목록 캐시 (users 워터마크가 바뀔 때만 재조회)
+        self._active_users_cache = None   # set[user_id]: 봇을 돌려야 하는 유저
+        self._users_watermark = None      # (MAX(updated_at), COUNT(id))
+        self._user_ids = set()            # 전체 유저 id (삭제 감지용: 변경분 조회 후 행 수 대조)
+        self._last_full_user_scan = float('-inf')
+        self.full_user_scan_interval = 1200  # seconds; updated_at을 거치지 않는 변경(직접 SQL 등) 대비 전체 재조회 주기
+        self._email_cache: Dict[int, str] = {}  # user_id -> email (관리자 알림 표시용, 활성 유저 조회 시 갱신)
+        
+        # 직접 띄운 봇 프로세스 감시: sentinel을 epoll에 등록해 종료 즉시 감지
+        # (epoll 미지원 환경/이전 매니저가 띄운 봇은 psutil 폴링 유지)
+        self._children: Dict[int, Any] = {}   # user_id -> multiprocessing.Process
+        self._sentinels: Dict[int, int] = {}  # sentinel fd -> user_id
+        self._epoll = select_mod.epoll() if hasattr(select_mod, 'epoll') else None
+        self._children_lock = threading.Lock()  # 유저별 관리 작업이 워커 스레드에서 동시에 등록/해제
+        # 이전 매니저가 띄운(psutil로 관리하는) 봇의 /proc/<pid>/stat fd: 주기마다 open/close 없이 pread만
+        self._stat_fds: Dict[int, tuple] = {}  # user_id -> (pid, fd)
+        # stop()이 epoll 대기를 바로 깨우도록 pipe 하나를 같이 등록 (시그널 핸들러에서 써도 막히지 않게 non-blocking)
+        self._wakeup_r = self._wakeup_w = None
+        if self._epoll is not None:
+            self._wakeup_r, self._wakeup_w = os.pipe()
+            os.set_blocking(self._wakeup_w, False)
+            self._epoll.register(self._wakeup_r, select_mod.EPOLLIN)
+        # 웹앱에서 유저 설정(repeat/API 키 등)이 바뀌면 받는 알림 → 폴링 주기를 기다리지 않고 바로 다음 주기 실행
+        self._user_signal = manager_signal.open_listener() if self._epoll is not None else None
+        if self._user_signal is not None:
+            self._epoll.register(self._user_signal.fileno(), select_mod.EPOLLIN)
+        
+        # BotEvent는 바로 커밋하지 않고 모아서 주기당 한 번 INSERT (DB 장애 시 무한 증가 방지용 상한)
+        self._event_buffer = deque(maxlen=10000)
+        
+        # 유저별 시작/헬스체크/재시작은 서로 독립 → 워커 스레드로 병렬 처리 (한 유저의 느린 종료 대기가 전체 주기를 막지 않도록)
+        self._pool = ThreadPoolExecutor(max_workers=min(16, 2 * (os.cpu_count() or 1)),
+                                        thread_name_prefix='bot-manage')
         
         # Admin telegram for alerts
         self.admin_telegram_token = None
         self.admin_chat_id = None
+        self.admin_config_ttl = 600  # seconds; 관리자 텔레그램 설정 변경은 이 주기로 반영
+        self._admin_config_loaded_at = float('-inf')
         self._load_admin_config()
         
         # Bot runner configuration
         self.bot_runner_dir = self._init_bot_runner_dir()
         self.python_executable = self._init_python_executable()
         
+        # 봇 프로세스는 Blitz_app/ccxt를 미리 import한 forkserver에서 fork (봇마다 인터프리터 새로 띄우지 않음)
+        self._ctx = multiprocessing.get_context('forkserver')
+        self._ctx.set_executable(self.python_executable)
+        self._ctx.set_forkserver_preload(['Blitz_app', 'Blitz_app.models', 'Blitz_app.bot', 'Blitz_app.bot_runner'])
+        
     def _init_bot_runner_dir(self) -> str:
         """Initialize and return the bot runner directory path"""
         # Get configured directory or use default
@@ -107,10 +169,14 @@ class BotManager:
         return sys.executable
         
     def _load_admin_config(self):
-        """Load admin telegram config for alerts"""
+        """Load admin telegram config for alerts (re-read by run() every admin_config_ttl seconds)"""
+        # 실패해도 TTL 동안은 재시도하지 않음 (주기마다 조회 방지)
+        self._admin_config_loaded_at = time.monotonic()
         try:
-            with self.app.app_context():
-                admin = User.query.filter_by(email='admin@admin.com').first()
+            with self._db_scope():
+                admin = db.session.execute(
+                    select(User.telegram_token, User.telegram_chat_id).where(User.email == 'admin@admin.com')
+                ).first()
                 if admin and admin.telegram_token and admin.telegram_chat_id:
                     self.admin_telegram_token = admin.telegram_token
                     self.admin_chat_id = admin.telegram_chat_id
@@ -131,7 +197,7 @@ class BotManager:
         }
         
         log_level = getattr(logging, level.upper(), logging.INFO)
-        logger.log(log_level, json.dumps(log_data, ensure_ascii=False))
+        logger.log(log_level, odumps(log_data))
     
     def _send_admin_alert(self, message: str, user_id: Optional[int] = None):
         """Send Telegram alert to admin with emojis and user identification"""
@@ -139,40 +205,219 @@ class BotManager:
             return
         
         try:
-            # Add user identification if provided
+            # Add user identification if provided (이메일은 캐시 사용 → 장애 폭주 시 알림마다 DB 조회하지 않음)
             if user_id:
-                with self.app.app_context():
-                    user = User.query.get(user_id)
-                    if user:
-                        user_info = f" (User: {user.email} / ID: {user_id})"
-                        message += user_info
+                email = self._email_cache.get(user_id)
+                if email is None:
+                    with self._db_scope():
+                        email = db.session.execute(
+                            select(User.email).where(User.id == user_id)
+                        ).scalar_one_or_none()
+                    if email is not None:
+                        self._email_cache[user_id] = email
+                if email is not None:
+                    user_info = f" (User: {email} / ID: {user_id})"
+                    message += user_info
             
             send_telegram(self.admin_telegram_token, self.admin_chat_id, message)
         except Exception as e:
             logger.error(f"Failed to send admin alert: {e}")
     
-    def _get_bot_process_info(self, user_id: int) -> Optional[dict]:
-        """Get bot process information"""
+    def _watch_child(self, user_id: int, proc):
+        """Register a spawned bot so its exit wakes run() via epoll"""
+        with self._children_lock:
+            self._children[user_id] = proc
+            if self._epoll is None:
+                return
+            # sentinel은 forkserver가 종료 코드를 보내면 읽기 가능해짐 (pidfd와 달리 종료 코드 수신 시점과 일치)
+            self._epoll.register(proc.sentinel, select_mod.EPOLLIN)
+            self._sentinels[proc.sentinel] = user_id
+    
+    def _unwatch_child(self, user_id: int):
+        """Drop the process handle for a bot that exited or was stopped"""
+        with self._children_lock:
+            proc = self._children.pop(user_id, None)
+            for fd, uid in list(self._sentinels.items()):
+                if uid == user_id:
+                    del self._sentinels[fd]
+                    try:
+                        self._epoll.unregister(fd)
+                    except (OSError, ValueError):
+                        pass
+        if proc is not None:
+            try:
+                proc.close()  # sentinel 등 자원 해제 (아직 실행 중이면 ValueError)
+            except ValueError:
+                pass
+    
+    def _is_watched(self, user_id: int) -> bool:
+        return user_id in self._children and user_id in self._sentinels.values()
+    
+    def _wait_for_exits(self, timeout: float) -> bool:
+        """
+        Sleep up to timeout seconds, returning early when a watched bot process exits,
+        user settings change or stop() is called. Returns True if a bot exited or settings changed
+        """
+        if self._epoll is None:
+            self.stop_event.wait(timeout)
+            return False
+        
+        woke = False
+        for fd, _ in self._epoll.poll(timeout):
+            if fd == self._wakeup_r:
+                continue  # stop() 호출 → run() 루프 조건에서 종료
+            if self._user_signal is not None and fd == self._user_signal.fileno():
+                manager_signal.drain(self._user_signal)
+                logger.debug("User settings changed, running the next cycle now")
+                woke = True
+                continue
+            user_id = self._sentinels.get(fd)
+            if user_id is None:
+                continue
+            woke = True
+            proc = self._children.get(user_id)
+            returncode = None
+            if proc is not None:
+                proc.join(0)
+                returncode = proc.exitcode
+            self._unwatch_child(user_id)
+            
+            try:
+                with self._db_scope():
+                    db.session.execute(
+                        update(UserBot).where(UserBot.user_id == user_id).values(pid=None, status='stopped')
+                    )
+                    db.session.commit()
+            except Exception as e:
+                logger.error(f"Error recording bot exit for user {user_id}: {e}")
+            self._queue_event(user_id, 'bot_exited', {'returncode': returncode})
+            
+            self._log_structured(
+                'warning', 'bot_exited', user_id,
+                f"Bot process exited with code {returncode}",
+                "Bot will be restarted on this cycle if still active (subject to backoff)"
+            )
+            self._send_admin_alert(f"💥 Bot process exited for user {user_id} (code: {returncode})", user_id)
+        return woke
+    
+    def _proc_state(self, user_id: int, pid: int) -> Optional[bytes]:
+        """State byte from /proc/<pid>/stat (b'Z' = zombie) via a cached fd; None if it can't be read"""
+        entry = self._stat_fds.get(user_id)
+        if entry is None or entry[0] != pid:
+            self._close_stat_fd(user_id)
+            try:
+                fd = os.open(f"/proc/{pid}/stat", os.O_RDONLY | os.O_CLOEXEC)
+            except OSError:
+                return None
+            entry = self._stat_fds[user_id] = (pid, fd)
+        try:
+            # "pid (comm) S ..." — comm에 ')'가 들어갈 수 있으므로 마지막 ')' 뒤 두 번째 바이트가 상태
+            data = os.pread(entry[1], 512, 0)
+        except OSError:
+            # 프로세스가 사라지면 ESRCH → fd 정리 (같은 pid 재사용과 섞이지 않음)
+            self._close_stat_fd(user_id)
+            return None
+        i = data.rfind(b')')
+        return data[i + 2:i + 3] if i >= 0 else None
+    
+    def _close_stat_fd(self, user_id: int):
+        entry = self._stat_fds.pop(user_id, None)
+        if entry is not None:
+            try:
+                os.close(entry[1])
+            except OSError:
+                pass
+    
+    def _load_bot_rows(self, user_ids) -> Optional[Dict[int, Any]]:
+        """user_id -> UserBot row (pid/status/last_heartbeat_at/restart_count) in one SELECT; None on error"""
+        if not user_ids:
+            return {}
         try:
+            with self._db_scope():
+                rows = db.session.execute(
+                    select(UserBot.user_id, UserBot.pid, UserBot.status,
+                           UserBot.last_heartbeat_at, UserBot.restart_count)
+                    .where(UserBot.user_id.in_(list(user_ids)))
+                ).all()
+            return {row.user_id: row for row in rows}
+        except Exception as e:
+            logger.error(f"Error loading bot rows: {e}")
+            return None
+    
+    @contextmanager
+    def _db_scope(self):
+        """Reuse the run() cycle's app context/session if active, else push a new one"""
+        if has_app_context():
+            try:
+                yield
+            except Exception:
+                # 주기 내 다른 헬퍼가 같은 세션을 계속 쓰므로 실패한 트랜잭션은 여기서 정리
+                db.session.rollback()
+                raise
+        else:
             with self.app.app_context():
-                bot_info = UserBot.query.get(user_id)
-                if not bot_info or not bot_info.pid:
-                    return None
-                
-                # Check if process exists and is our bot
-                try:
-                    proc = psutil.Process(bot_info.pid)
-                    if proc.is_running():
-                        return {
-                            'pid': bot_info.pid,
-                            'status': bot_info.status,
-                            'last_heartbeat': bot_info.last_heartbeat_at,
-                            'process': proc
-                        }
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    # Process doesn't exist, clean up DB
-                    bot_info.pid = None
-                    bot_info.status = 'stopped'
+                yield
+    
+    def _queue_event(self, user_id: int, event_type: str, payload: dict):
+        """Buffer a BotEvent row; written by _flush_events once per cycle"""
+        self._event_buffer.append({
+            'user_id': user_id,
+            'type': event_type,
+            'payload': odumps(payload),
+            'created_at': datetime.utcnow(),  # 발생 시각 유지 (flush 시각 아님)
+        })
+    
+    def _flush_events(self):
+        """Insert all buffered BotEvents in one statement/commit (kept for retry on failure)"""
+        if not self._event_buffer:
+            return
+        rows = list(self._event_buffer)
+        try:
+            with self._db_scope():
+                db.session.execute(insert(BotEvent), rows)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows)} bot events: {e}")
+            return
+        for _ in rows:
+            self._event_buffer.popleft()
+    
+    def _get_bot_process_info(self, user_id: int, bot_row=_NOT_LOADED) -> Optional[dict]:
+        """Get bot process information (bot_row: UserBot row from _load_bot_rows, None if no row)"""
+        try:
+            if bot_row is _NOT_LOADED:
+                with self._db_scope():
+                    bot_row = UserBot.query.get(user_id)
+            if not bot_row or not bot_row.pid:
+                return None
+            
+            # epoll로 감시 중인 자식은 종료 시 즉시 회수되므로 살아 있음이 보장됨 → /proc 조회 생략
+            if self._is_watched(user_id):
+                return {
+                    'pid': bot_row.pid,
+                    'status': bot_row.status,
+                    'last_heartbeat': bot_row.last_heartbeat_at,
+                    'process': self._children[user_id]
+                }
+            
+            # Check if process exists and is our bot
+            # (주기당 한 번 만든 pid 집합으로 먼저 확인 → 죽은 pid는 psutil.Process를 만들지 않음;
+            #  방금 만든 Process의 is_running()은 항상 참이라 생략)
+            try:
+                if not self._pid_alive(bot_row.pid):
+                    raise psutil.NoSuchProcess(bot_row.pid)
+                return {
+                    'pid': bot_row.pid,
+                    'status': bot_row.status,
+                    'last_heartbeat': bot_row.last_heartbeat_at,
+                    'process': psutil.Process(bot_row.pid)
+                }
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                # Process doesn't exist, clean up DB (상태가 바뀔 때만 쓰기)
+                with self._db_scope():
+                    db.session.execute(
+                        update(UserBot).where(UserBot.user_id == user_id).values(pid=None, status='stopped')
+                    )
                     db.session.commit()
                     
         except Exception as e:
@@ -180,105 +425,61 @@ class BotManager:
         
         return None
     
+    def _pid_alive(self, pid: int) -> bool:
+        """pid 존재 여부 (run() 주기 안에서는 psutil.pids() 한 번으로 만든 집합 재사용)"""
+        live = self._live_pids
+        if live is _NOT_LOADED:
+            return psutil.pid_exists(pid)
+        if live is None:
+            live = self._live_pids = set(psutil.pids())
+        return pid in live
+    
     def _start_bot_process(self, user_id: int) -> bool:
         """Start a new bot process for the user"""
         try:
-            with self.app.app_context():
+            with self._db_scope():
                 user = User.query.get(user_id)
                 if not user:
                     logger.error(f"User {user_id} not found")
                     return False
                 
-                # Create bot startup script in configured directory
-                script_filename = f"bot_runner_{user_id}.py"
-                script_path = os.path.join(self.bot_runner_dir, script_filename)
-                
-                logger.info(f"Creating bot runner script for user {user_id}: {script_path}")
-                
-                with open(script_path, 'w') as f:
-                    f.write(f"""
-import sys
-import os
-sys.path.insert(0, '{os.getcwd()}')
-
-from Blitz_app import create_app
-from Blitz_app.bot import run_bot
-from threading import Event
-
-app = create_app()
-with app.app_context():
-    from Blitz_app.models import User
-    user = User.query.get({user_id})
-    if user:
-        config = user.to_dict()
-        config['api_key'] = user.api_key
-        config['api_secret'] = user.api_secret
-        config['telegram_token'] = user.telegram_token
-        config['telegram_chat_id'] = user.telegram_chat_id
-        
-        stop_event = Event()
-        try:
-            run_bot(config, stop_event, {user_id}, user.exchange or 'bybit')
-        except Exception as e:
-            print(f"Bot error: {{e}}")
-            sys.exit(1)
-    else:
-        print("User not found")
-        sys.exit(1)
-""")
-                
-                # Set proper file permissions (readable by owner/group)
-                os.chmod(script_path, 0o640)
+                logger.info(f"Starting bot process for user {user_id} via forkserver ({self.python_executable})")
                 
-                # Log file creation details
-                file_stat = os.stat(script_path)
-                logger.info(f"Bot runner script created - Size: {file_stat.st_size} bytes, Mode: {oct(file_stat.st_mode)}")
+                # forkserver가 이미 import한 모듈을 공유하므로 runner 스크립트/새 인터프리터 불필요
+                # 출력은 유저별 로그 파일에 이어 쓰기 (매니저 콘솔에 섞이지 않고, 종료 후에도 확인 가능)
+                log_path = os.path.join(self.bot_runner_dir, f"bot_{user_id}.log")
+                proc = self._ctx.Process(target=run_bot_process, args=(user_id, log_path), name=f"bot-{user_id}")
+                proc.start()
                 
-                # Start the process using Python interpreter explicitly
-                # This avoids needing execute permission on the script itself
-                cmd = [self.python_executable, '-u', script_path]
-                
-                logger.info(f"Starting bot process for user {user_id} with command: {' '.join(cmd)}")
-                
-                proc = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.PIPE,
-                    cwd=os.getcwd(),
-                    env=os.environ.copy()
-                )
-                
-                # Update database
-                bot_info = UserBot.query.get(user_id)
-                if not bot_info:
-                    bot_info = UserBot(user_id=user_id)
-                    db.session.add(bot_info)
-                
-                bot_info.pid = proc.pid
-                bot_info.status = 'running'
-                bot_info.last_heartbeat_at = datetime.utcnow()
-                bot_info.restart_count += 1
+                # Update database (조회~수정 사이 autoflush 없이 한 번의 커밋으로 기록, bot_started 이벤트는 주기 끝 일괄 INSERT)
+                with db.session.no_autoflush:
+                    bot_info = UserBot.query.get(user_id)
+                    if not bot_info:
+                        # 컬럼 default는 INSERT 시점에만 적용되므로 새 행은 직접 0으로 시작
+                        bot_info = UserBot(user_id=user_id, restart_count=0)
+                        db.session.add(bot_info)
+                    
+                    bot_info.pid = proc.pid
+                    bot_info.status = 'running'
+                    bot_info.last_heartbeat_at = datetime.utcnow()
+                    bot_info.restart_count = restart_count = (bot_info.restart_count or 0) + 1
                 db.session.commit()
+                # 커밋 후 만료된 bot_info를 다시 읽지 않도록 로컬 값 사용
+                self._restart_counts[user_id] = restart_count
+                
+                self._watch_child(user_id, proc)
                 
                 # Log event
-                event = BotEvent(
-                    user_id=user_id,
-                    type='bot_started',
-                    payload=json.dumps({
-                        'pid': proc.pid, 
-                        'restart_count': bot_info.restart_count,
-                        'script_path': script_path,
-                        'python_executable': self.python_executable
-                    })
-                )
-                db.session.add(event)
-                db.session.commit()
+                self._queue_event(user_id, 'bot_started', {
+                    'pid': proc.pid, 
+                    'restart_count': restart_count,
+                    'python_executable': self.python_executable
+                })
                 
                 self._log_structured(
                     'info', 'bot_started', user_id,
                     f"Bot process started with PID {proc.pid} using {self.python_executable}",
                     f"Monitor process health via PID {proc.pid}",
-                    script_path=script_path,
                     python_executable=self.python_executable
                 )
                 
@@ -322,10 +523,39 @@ with app.app_context():
             self._send_admin_alert(f"❌ Failed to start bot for user {user_id}: {e}", user_id)
             return False
     
-    def _stop_bot_process(self, user_id: int, force: bool = False) -> bool:
+    @staticmethod
+    def _wait_process(proc, timeout: Optional[float] = None) -> bool:
+        """Wait for a multiprocessing.Process or psutil.Process to exit; False on timeout"""
+        if isinstance(proc, psutil.Process):
+            # 이전 매니저가 띄운 봇(내 자식 아님): pidfd로 종료 시점까지 블록 (psutil.wait는 sleep 폴링)
+            pidfd = None
+            if hasattr(os, 'pidfd_open'):
+                try:
+                    pidfd = os.pidfd_open(proc.pid)
+                except ProcessLookupError:
+                    return True  # 이미 종료
+                except OSError:
+                    pidfd = None
+            if pidfd is not None:
+                try:
+                    poller = select_mod.poll()
+                    poller.register(pidfd, select_mod.POLLIN)
+                    return bool(poller.poll(None if timeout is None else timeout * 1000))
+                finally:
+                    os.close(pidfd)
+            try:
+                proc.wait(timeout=timeout)
+            except psutil.TimeoutExpired:
+                return False
+            return True
+        proc.join(timeout)
+        return proc.exitcode is not None
+    
+    def _stop_bot_process(self, user_id: int, force: bool = False, bot_info: Optional[dict] = None) -> bool:
         """Stop bot process for the user"""
         try:
-            bot_info = self._get_bot_process_info(user_id)
+            if bot_info is None:
+                bot_info = self._get_bot_process_info(user_id)
             if not bot_info:
                 return True  # Already stopped
             
@@ -334,41 +564,25 @@ with app.app_context():
             if not force:
                 # Try graceful shutdown first
                 proc.terminate()
-                try:
-                    proc.wait(timeout=10)
-                except subprocess.TimeoutExpired:
+                if not self._wait_process(proc, timeout=10):
                     force = True
             
             if force:
                 proc.kill()
-                proc.wait()
+                self._wait_process(proc)
+            
+            self._unwatch_child(user_id)
+            self._close_stat_fd(user_id)
             
             # Update database
-            with self.app.app_context():
-                bot_record = UserBot.query.get(user_id)
-                if bot_record:
-                    bot_record.pid = None
-                    bot_record.status = 'stopped'
-                    db.session.commit()
-                
-                # Log event
-                event = BotEvent(
-                    user_id=user_id,
-                    type='bot_stopped',
-                    payload=json.dumps({'forced': force})
+            with self._db_scope():
+                db.session.execute(
+                    update(UserBot).where(UserBot.user_id == user_id).values(pid=None, status='stopped')
                 )
-                db.session.add(event)
                 db.session.commit()
             
-            # Clean up the runner script file
-            script_filename = f"bot_runner_{user_id}.py"
-            script_path = os.path.join(self.bot_runner_dir, script_filename)
-            try:
-                if os.path.exists(script_path):
-                    os.unlink(script_path)
-                    logger.info(f"Cleaned up runner script: {script_path}")
-            except OSError as e:
-                logger.warning(f"Failed to clean up runner script {script_path}: {e}")
+            # Log event
+            self._queue_event(user_id, 'bot_stopped', {'forced': force})
             
             self._log_structured(
                 'info', 'bot_stopped', user_id,
@@ -385,17 +599,22 @@ with app.app_context():
             )
             return False
     
-    def _check_bot_health(self, user_id: int) -> bool:
+    def _check_bot_health(self, user_id: int, bot_info: Optional[dict] = None) -> bool:
         """Check bot health and take action if needed"""
         try:
-            bot_info = self._get_bot_process_info(user_id)
+            if bot_info is None:
+                bot_info = self._get_bot_process_info(user_id)
             if not bot_info:
                 return False  # Bot not running
             
-            # Check heartbeat age
-            if bot_info['last_heartbeat']:
-                heartbeat_age = datetime.utcnow() - bot_info['last_heartbeat']
-                if heartbeat_age > timedelta(minutes=5):  # 5 minutes without heartbeat
+            # Check heartbeat age (주기 시작 시 계산한 기준 시각과 비교, 메시지용 경과 시간은 stale일 때만 계산)
+            last_heartbeat = bot_info['last_heartbeat']
+            if last_heartbeat:
+                cutoff = self._heartbeat_cutoff
+                if cutoff is None:
+                    cutoff = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
+                if last_heartbeat < cutoff:
+                    heartbeat_age = cutoff - last_heartbeat + timedelta(seconds=self.heartbeat_timeout)
                     self._log_structured(
                         'warning', 'bot_heartbeat_stale', user_id,
                         f"Bot heartbeat is {heartbeat_age.total_seconds():.0f}s old",
@@ -406,7 +625,7 @@ with app.app_context():
             
             # Check if process is responsive (could add more checks here)
             proc = bot_info['process']
-            if proc.status() == psutil.STATUS_ZOMBIE:
+            if isinstance(proc, psutil.Process) and self._proc_state(user_id, proc.pid) == b'Z':
                 self._log_structured(
                     'error', 'bot_process_zombie', user_id,
                     "Bot process is in zombie state",
@@ -425,37 +644,45 @@ with app.app_context():
             )
             return False
     
-    def _should_restart_bot(self, user_id: int) -> bool:
+    def _restart_count(self, user_id: int, bot_row=_NOT_LOADED) -> int:
+        """restart_count from this cycle's bot row, else the in-memory mirror, else (cold) the DB"""
+        if bot_row is not _NOT_LOADED:
+            return (bot_row.restart_count or 0) if bot_row else 0
+        count = self._restart_counts.get(user_id)
+        if count is None:
+            with self._db_scope():
+                count = db.session.execute(
+                    select(UserBot.restart_count).where(UserBot.user_id == user_id)
+                ).scalar_one_or_none() or 0
+            self._restart_counts[user_id] = count
+        return count
+    
+    def _should_restart_bot(self, user_id: int, bot_row=_NOT_LOADED) -> bool:
         """Check if bot should be restarted (respecting backoff)"""
         if user_id in self.restart_backoff:
-            if time.time() < self.restart_backoff[user_id]:
+            if time.monotonic() < self.restart_backoff[user_id]:
                 return False
         
         try:
-            with self.app.app_context():
-                bot_info = UserBot.query.get(user_id)
-                if bot_info and bot_info.restart_count >= self.max_restart_attempts:
-                    self._log_structured(
-                        'error', 'bot_max_restarts', user_id,
-                        f"Bot exceeded max restart attempts ({self.max_restart_attempts})",
-                        "Manual intervention required - check user configuration"
-                    )
-                    self._send_admin_alert(f"🚨 Bot exceeded max restarts for user {user_id}", user_id)
-                    return False
+            if self._restart_count(user_id, bot_row) >= self.max_restart_attempts:
+                self._log_structured(
+                    'error', 'bot_max_restarts', user_id,
+                    f"Bot exceeded max restart attempts ({self.max_restart_attempts})",
+                    "Manual intervention required - check user configuration"
+                )
+                self._send_admin_alert(f"🚨 Bot exceeded max restarts for user {user_id}", user_id)
+                return False
         except Exception:
             pass
         
         return True
     
-    def _set_restart_backoff(self, user_id: int):
+    def _set_restart_backoff(self, user_id: int, bot_row=_NOT_LOADED):
         """Set exponential backoff for bot restart"""
         try:
-            with self.app.app_context():
-                bot_info = UserBot.query.get(user_id)
-                restart_count = bot_info.restart_count if bot_info else 0
-                
+            restart_count = self._restart_count(user_id, bot_row)
             backoff_time = min(self.restart_backoff_base * (2 ** restart_count), 300)  # max 5 minutes
-            self.restart_backoff[user_id] = time.time() + backoff_time
+            self.restart_backoff[user_id] = time.monotonic() + backoff_time
             
             self._log_structured(
                 'info', 'restart_backoff_set', user_id,
@@ -467,77 +694,140 @@ with app.app_context():
     def _cleanup_stale_runner_scripts(self):
         """Clean up stale bot runner scripts for users that are no longer running"""
         try:
-            if not os.path.exists(self.bot_runner_dir):
-                return
-                
             # Get currently active users
             active_users = set(self._get_active_users())
             currently_running = set(self.managed_bots.keys())
             
-            # Clean up scripts for users no longer running
-            for filename in os.listdir(self.bot_runner_dir):
-                if filename.startswith('bot_runner_') and filename.endswith('.py'):
+            # Clean up scripts for users no longer running (scandir: 파일명/경로를 stat 없이 바로 사용)
+            with os.scandir(self.bot_runner_dir) as entries:
+                for entry in entries:
+                    filename = entry.name
+                    if not (filename.startswith('bot_runner_') and filename.endswith('.py')):
+                        continue
                     try:
                         # Extract user_id from filename
-                        user_id_str = filename[11:-3]  # Remove 'bot_runner_' and '.py'
-                        user_id = int(user_id_str)
+                        user_id = int(filename[11:-3])  # Remove 'bot_runner_' and '.py'
                         
                         # Remove if user is not active and not currently managed
                         if user_id not in active_users and user_id not in currently_running:
-                            script_path = os.path.join(self.bot_runner_dir, filename)
-                            os.unlink(script_path)
-                            logger.info(f"Cleaned up stale runner script: {script_path}")
+                            os.unlink(entry.path)
+                            logger.info(f"Cleaned up stale runner script: {entry.path}")
                             
                     except (ValueError, OSError) as e:
                         logger.warning(f"Error cleaning up runner script {filename}: {e}")
                         
+        except FileNotFoundError:
+            return  # runner 디렉터리 없음
         except Exception as e:
             logger.error(f"Error during runner script cleanup: {e}")
     
-    def _manage_user_bot(self, user_id: int, should_run: bool):
+    def _manage_user_bot(self, user_id: int, should_run: bool, bot_rows: Optional[Dict[int, Any]] = None):
         """Manage individual user bot (start/stop/restart as needed)"""
-        bot_info = self._get_bot_process_info(user_id)
+        # run()이 주기당 한 번 일괄 조회한 UserBot 행 재사용 (없으면 개별 조회)
+        bot_row = bot_rows.get(user_id) if bot_rows is not None else _NOT_LOADED
+        bot_info = self._get_bot_process_info(user_id, bot_row)
         is_running = bot_info is not None
         
         if should_run and not is_running:
             # Should be running but isn't - start it
-            if self._should_restart_bot(user_id):
+            if self._should_restart_bot(user_id, bot_row):
                 if self._start_bot_process(user_id):
                     self.restart_backoff.pop(user_id, None)  # Clear backoff on success
                 else:
-                    self._set_restart_backoff(user_id)
+                    self._set_restart_backoff(user_id, bot_row)
                     
         elif should_run and is_running:
             # Should be running and is - check health
-            if not self._check_bot_health(user_id):
+            if not self._check_bot_health(user_id, bot_info):
                 # Health check failed, restart
-                self._stop_bot_process(user_id)
-                if self._should_restart_bot(user_id):
+                self._stop_bot_process(user_id, bot_info=bot_info)
+                if self._should_restart_bot(user_id, bot_row):
                     if self._start_bot_process(user_id):
                         self.restart_backoff.pop(user_id, None)
                     else:
-                        self._set_restart_backoff(user_id)
+                        self._set_restart_backoff(user_id, bot_row)
                         
         elif not should_run and is_running:
             # Shouldn't be running but is - stop it
-            self._stop_bot_process(user_id)
+            self._stop_bot_process(user_id, bot_info=bot_info)
+    
+    def _manage_user_bot_worker(self, user_id: int, bot_rows: Optional[Dict[int, Any]]):
+        """_manage_user_bot on a pool thread, with its own app context (= its own DB session)"""
+        with self.app.app_context():
+            self._manage_user_bot(user_id, True, bot_rows)
     
     def _get_active_users(self) -> list:
-        """Get list of users who should have bots running"""
+        """Get list of users who should have bots running (only changed users are re-read)"""
         try:
-            with self.app.app_context():
-                # Users with valid config who want bots running
-                users = User.query.filter(
-                    User.api_key.isnot(None),
-                    User.api_secret.isnot(None),
-                    User.telegram_token.isnot(None),
-                    User.repeat == True  # User wants bot to run
-                ).all()
-                return [user.id for user in users]
+            with self._db_scope():
+                # 워터마크(최근 수정 시각 + 행 수)가 그대로면 조회 생략
+                watermark = tuple(db.session.execute(
+                    select(func.max(User.updated_at), func.count(User.id))
+                ).one())
+                full_scan_due = time.monotonic() - self._last_full_user_scan >= self.full_user_scan_interval
+                if self._active_users_cache is not None and not full_scan_due:
+                    if watermark == self._users_watermark:
+                        return list(self._active_users_cache)
+                    if self._apply_user_changes(watermark):
+                        return list(self._active_users_cache)
+                
+                self._full_user_scan(watermark)
+                return list(self._active_users_cache)
         except Exception as e:
             logger.error(f"Error getting active users: {e}")
+            # 일시적 DB 오류(락 등)로 실행 중인 봇을 모두 중지하지 않도록 마지막 결과 유지
+            # (워터마크는 갱신되지 않았으므로 다음 주기에 다시 읽음)
+            if self._active_users_cache is not None:
+                return list(self._active_users_cache)
             return []
     
+    @staticmethod
+    def _active_user_filter():
+        # Users with valid config who want bots running
+        return and_(
+            User.api_key.isnot(None),
+            User.api_secret.isnot(None),
+            User.telegram_token.isnot(None),
+            User.repeat == True  # User wants bot to run
+        )
+    
+    def _full_user_scan(self, watermark):
+        rows = db.session.execute(
+            select(User.id, User.email, self._active_user_filter().label('active'))
+        ).all()
+        self._user_ids = {row.id for row in rows}
+        self._active_users_cache = {row.id for row in rows if row.active}
+        # 비활성으로 바뀐 유저도 중지 알림에 이메일이 필요하므로 덮어쓰지 않고 갱신
+        self._email_cache.update({row.id: row.email for row in rows if row.active})
+        self._users_watermark = watermark
+        self._last_full_user_scan = time.monotonic()
+    
+    def _apply_user_changes(self, watermark) -> bool:
+        """
+        Re-read only users modified since the last watermark and patch the cached sets.
+        Returns False when a full scan is needed (first run, or a deletion was detected).
+        """
+        since = self._users_watermark[0] if self._users_watermark else None
+        if since is None:
+            return False
+        # 같은 시각에 커밋된 행을 놓치지 않도록 경계 포함(>=)
+        rows = db.session.execute(
+            select(User.id, User.email, self._active_user_filter().label('active'))
+            .where(User.updated_at >= since)
+        ).all()
+        user_ids = self._user_ids | {row.id for row in rows}
+        if len(user_ids) != watermark[1]:
+            return False  # 삭제된 유저가 있음 → 전체 재조회
+        for row in rows:
+            if row.active:
+                self._active_users_cache.add(row.id)
+                self._email_cache[row.id] = row.email
+            else:
+                self._active_users_cache.discard(row.id)
+        self._user_ids = user_ids
+        self._users_watermark = watermark
+        return True
+    
     def run(self):
         """Main bot manager loop"""
         logger.info("🎯 Bot Manager starting up")
@@ -545,43 +835,73 @@ with app.app_context():
         logger.info(f"Python executable: {self.python_executable}")
         self._send_admin_alert("🎯 Bot Manager started")
         
-        cleanup_counter = 0
-        cleanup_interval = 10  # Run cleanup every 10 cycles (5 minutes with 30s intervals)
+        # 봇은 forkserver에서 bot_runner.run으로 시작하므로 runner 스크립트를 더 만들지 않음
+        # → 이전 버전이 남긴 스크립트만 시작 시 한 번 정리 (주기마다 listdir 하지 않음)
+        self._cleanup_stale_runner_scripts()
         
         while not self.stop_event.is_set():
             try:
-                # Get users who should have bots running
-                active_users = self._get_active_users()
-                
-                # Get currently managed bots
-                current_bots = set(self.managed_bots.keys())
-                
-                # Determine which bots to start/stop
-                should_run = set(active_users)
-                
-                # Stop bots that shouldn't be running
-                for user_id in current_bots - should_run:
-                    self._manage_user_bot(user_id, False)
-                    self.managed_bots.pop(user_id, None)
-                
-                # Start/check bots that should be running
-                for user_id in should_run:
-                    self._manage_user_bot(user_id, True)
-                    self.managed_bots[user_id] = {'last_checked': time.time()}
+                # 주기당 app context(=세션) 1개: 헬퍼들은 _db_scope()로 재사용
+                # (대기는 컨텍스트 밖에서 → 대기 중 연결/SQLite 읽기 스냅샷을 잡지 않음)
+                with self.app.app_context():
+                    now = time.time()
+                    events_before = len(self._event_buffer)
+                    self._live_pids = None
+                    
+                    if time.monotonic() - self._admin_config_loaded_at >= self.admin_config_ttl:
+                        self._load_admin_config()
+                    self._heartbeat_cutoff = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
+                    
+                    # Get users who should have bots running
+                    active_users = self._get_active_users()
+                    
+                    # Determine which bots to start/stop
+                    should_run = set(active_users)
+                    
+                    # Currently managed bots that should stop (dict 키 뷰로 바로 차집합, 키 복사 생략)
+                    to_stop = self.managed_bots.keys() - should_run
+                    
+                    # 이번 주기에 다룰 모든 유저의 UserBot 상태를 한 번에 조회
+                    bot_rows = self._load_bot_rows(to_stop | should_run)
+                    
+                    # Stop bots that shouldn't be running
+                    for user_id in to_stop:
+                        self._manage_user_bot(user_id, False, bot_rows)
+                        self.managed_bots.pop(user_id, None)
+                    
+                    # Start/check bots that should be running (유저별로 워커 스레드에서 병렬 처리, 모두 끝날 때까지 대기)
+                    if len(should_run) > 1:
+                        list(self._pool.map(lambda uid: self._manage_user_bot_worker(uid, bot_rows), should_run))
+                    else:
+                        for user_id in should_run:
+                            self._manage_user_bot(user_id, True, bot_rows)
+                    for user_id in should_run:
+                        # 기존 bot_info dict는 제자리 갱신 (주기마다 유저별 dict 새로 만들지 않음)
+                        bot_info = self.managed_bots.get(user_id)
+                        if bot_info is None:
+                            self.managed_bots[user_id] = {'last_checked': now}
+                        else:
+                            bot_info['last_checked'] = now
+                    
+                    # 이번 주기에 쌓인 이벤트 일괄 기록 (새 이벤트가 있었다 = 봇 시작/중지 발생)
+                    state_changed = len(self._event_buffer) > events_before
+                    self._flush_events()
+                    self._heartbeat_cutoff = None
+                    self._live_pids = _NOT_LOADED
                 
-                # Periodic cleanup of stale runner scripts
-                cleanup_counter += 1
-                if cleanup_counter >= cleanup_interval:
-                    self._cleanup_stale_runner_scripts()
-                    cleanup_counter = 0
+                if state_changed:
+                    self.poll_interval = self.poll_min
+                else:
+                    self.poll_interval = min(self.poll_interval * self.poll_backoff, self.poll_max)
                 
-                # Wait before next check
-                time.sleep(self.health_check_interval)
+                # Wait before next check (감시 중인 봇 종료/유저 설정 변경 시 즉시 다음 주기 진행)
+                if self._wait_for_exits(self.poll_interval):
+                    self.poll_interval = self.poll_min
                 
             except Exception as e:
                 logger.error(f"Error in bot manager main loop: {e}")
                 self._send_admin_alert(f"❌ Bot Manager error: {e}")
-                time.sleep(30)  # Wait longer on error
+                self.stop_event.wait(30)  # Wait longer on error (종료 신호 시 즉시 반환)
         
         logger.info("🛑 Bot Manager shutting down")
         self._send_admin_alert("🛑 Bot Manager shutting down")
@@ -589,13 +909,19 @@ with app.app_context():
         # Stop all managed bots
         for user_id in list(self.managed_bots.keys()):
             self._stop_bot_process(user_id)
-        
-        # Final cleanup of runner scripts
-        self._cleanup_stale_runner_scripts()
+        self._flush_events()
+        self._pool.shutdown(wait=True)
+        if self._user_signal is not None:
+            manager_signal.close_listener(self._user_signal)
     
     def stop(self):
         """Stop the bot manager"""
         self.stop_event.set()
+        if self._wakeup_w is not None:
+            try:
+                os.write(self._wakeup_w, b'\0')
+            except OSError:
+                pass  # 이미 깨우기 바이트가 들어 있음 (pipe 가득 참)
 
 
 def run_bot_manager(app):
@@ -623,6 +949,8 @@ def run_bot_manager(app):
 
 if __name__ == '__main__':
     # Allow running bot manager standalone
-    from Blitz_app import create_app
+    from Blitz_app import create_app, init_db
     app = create_app()
+    # 웹 서비스보다 먼저 떠도 테이블/추가 컬럼(user.updated_at 등)이 있도록 (멱등)
+    init_db(app)
     run_bot_manager(app)
@@ -0,0 +1,67 @@
+# Blitz_app/bot_runner.py
+"""
+Per-user bot process entry point.
+
+BotManager forks run() from its preloaded forkserver; the same code can be
+started by hand with `python -m Blitz_app.bot_runner <user_id>` (no
+generated runner script, so the compiled module is reused from __pycache__).
+"""
+
+import os
+import sys
+from threading import Event
+
+
+def _redirect_output(log_path: str):
+    """stdout/stderr를 유저별 로그 파일(O_APPEND)로 연결 (사후 분석용, 파이프 버퍼 없음)"""
+    fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640)
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(fd, 1)
+        os.dup2(fd, 2)
+    finally:
+        os.close(fd)
+
+
+def run(user_id: int, log_path: str = None):
+    """Load the user's config and run the bot until it stops (output appended to log_path if given)"""
+    if log_path:
+        try:
+            _redirect_output(log_path)
+        except OSError as e:
+            print(f"Could not open bot log {log_path}: {e}")
+
+    from Blitz_app import create_app, telegram
+    from Blitz_app.bot import run_bot
+    from Blitz_app.models import User
+
+    app = create_app()
+    with app.app_context():
+        user = User.query.get(user_id)
+        if not user:
+            print("User not found")
+            sys.exit(1)
+
+        config = user.to_dict()
+        config['api_key'] = user.api_key
+        config['api_secret'] = user.api_secret
+        config['telegram_token'] = user.telegram_token
+        config['telegram_chat_id'] = user.telegram_chat_id
+
+        stop_event = Event()
+        try:
+            run_bot(config, stop_event, user_id, user.exchange or 'bybit')
+        except Exception as e:
+            print(f"Bot error: {e}")
+            sys.exit(1)
+        finally:
+            # forkserver 자식은 os._exit로 끝나 atexit가 돌지 않음 → 종료/실패 알림을 여기서 전송
+            telegram.flush()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("usage: python -m Blitz_app.bot_runner <user_id>")
+        sys.exit(2)
+    run(int(sys.argv[1]))
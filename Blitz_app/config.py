@@ -10,12 +10,30 @@ DB_PATH  = BASE_DIR / "instance" / "users.db"
 SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_PATH.as_posix()}"
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-# □ SQLAlchemy 엔진 옵션 (연결 재시도/헬스체크)
-SQLALCHEMY_ENGINE_OPTIONS = {
-    "pool_pre_ping": True,
-    # SQLite busy 상황에서 대기 시간(초)
-    "connect_args": {"timeout": 30},
-}
+# □ SQLAlchemy 엔진 옵션 (연결 재시도/헬스체크/풀 크기)
+def engine_options(uri):
+    """URI에 맞는 엔진 옵션. sqlite :memory: 는 QueuePool이 아니므로 풀 크기 옵션 제외"""
+    opts = {
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,          # 30분 이상 유휴 연결은 재생성
+        # SQLite busy 상황에서 대기 시간(초)
+        "connect_args": {"timeout": 30},
+    }
+    if uri.startswith("sqlite") and (uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri):
+        # 메모리 DB는 연결마다 별도 DB → 단일 연결(StaticPool)을 스레드 간 공유
+        from sqlalchemy.pool import StaticPool
+        opts["poolclass"] = StaticPool
+        opts["connect_args"]["check_same_thread"] = False
+    else:
+        opts.update({
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "20")),
+            "pool_use_lifo": True,     # 최근 사용 연결 우선 → 소수 연결만 warm 유지
+        })
+    return opts
+
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 # ===== Flask 세션/쿠키 =====
 # env 우선, 없으면 고정값 사용(안전)
@@ -34,8 +52,8 @@ WTF_CSRF_SECRET_KEY = SECRET_KEY
 # (선택) 8000과 8001을 동시에 쓸 때 쿠키 충돌 방지용 이름 지정 가능
 SESSION_COOKIE_NAME = os.environ.get("BLITZ_SESSION_COOKIE", "session")
 
-# ✅ Session 설정 (Redis 대신 filesystem 사용)
-SESSION_TYPE = "filesystem"
+# ✅ Session 설정 (기본 filesystem, BLITZ_SESSION_TYPE=redis 이면 Redis 사용)
+SESSION_TYPE = os.environ.get("BLITZ_SESSION_TYPE", "filesystem")
 SESSION_FILE_DIR = BASE_DIR / "instance" / "flask_session"
 SESSION_PERMANENT = True
 PERMANENT_SESSION_LIFETIME = timedelta(days=7)
@@ -43,9 +61,9 @@ SESSION_USE_SIGNER = True     # 쿠키 위변조 방지
 SESSION_COOKIE_SECURE = False # HTTPS가 아니면 False (나중에 SSL 붙이면 True로)
 SESSION_COOKIE_SAMESITE = "Lax"
 
-# Redis URL for production (commented out for development)
-# SESSION_TYPE = "redis"
-# SESSION_REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")
+# Redis 세션 (BLITZ_SESSION_TYPE=redis 일 때만 사용)
+SESSION_REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")
+SESSION_REDIS_MAX_CONNECTIONS = int(os.environ.get("SESSION_REDIS_MAX_CONNECTIONS", "64"))
 
 # 템플릿/디버그 최적화
 DEBUG = False
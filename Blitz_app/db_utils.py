@@ -34,6 +34,10 @@ def ensure_database_indices():
         # Bot commands
         "CREATE INDEX IF NOT EXISTS idx_bot_commands_user_id ON bot_command(user_id)" if _table_exists('bot_command') else None,
         "CREATE INDEX IF NOT EXISTS idx_bot_commands_status ON bot_command(status)" if _table_exists('bot_command') else None,
+        
+        # Recent-activity lookups (status API / admin health) on existing databases
+        "CREATE INDEX IF NOT EXISTS idx_bot_commands_user_created ON bot_commands(user_id, created_at)" if _table_exists('bot_commands') else None,
+        "CREATE INDEX IF NOT EXISTS idx_bot_events_type_created ON bot_events(type, created_at)" if _table_exists('bot_events') else None,
     ]
     
     # Filter out None values
@@ -58,6 +62,19 @@ def ensure_database_indices():
         'total_indices': len(indices_to_create)
     })
 
+def ensure_user_columns():
+    """기존 DB에 나중에 추가된 user 컬럼 보강 (create_all은 기존 테이블에 컬럼을 추가하지 않음)"""
+    try:
+        cols = {row[1] for row in db.session.execute(db.text("PRAGMA table_info('user')"))}
+        if cols and 'updated_at' not in cols:
+            db.session.execute(db.text("ALTER TABLE user ADD COLUMN updated_at DATETIME"))
+            db.session.execute(db.text("CREATE INDEX IF NOT EXISTS ix_user_updated_at ON user(updated_at)"))
+            db.session.commit()
+            current_app.logger.info("Added user.updated_at column")
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Failed to ensure user columns: {e}")
+
 def _table_exists(table_name: str) -> bool:
     """Check if a table exists in the database"""
     try:
@@ -0,0 +1,53 @@
+# Blitz_app/json_response.py
+"""
+Fast JSON responses for the API blueprints (and JSON strings for logs).
+
+Uses orjson when it is installed and falls back to the stdlib json module
+with the same output conventions otherwise.
+"""
+
+import json
+from datetime import date, datetime, timezone
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# naive datetime은 UTC로 간주하고 'Z' 접미사로 직렬화, int 키(user_id) 허용
+_ORJSON_OPTIONS = (orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _json_default(obj):
+    """stdlib fallback: orjson과 같은 형식으로 날짜 직렬화"""
+    if isinstance(obj, datetime):
+        if obj.tzinfo is not None:
+            obj = obj.astimezone(timezone.utc).replace(tzinfo=None)
+        return obj.isoformat() + 'Z'
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def oloads(raw):
+    """json.loads 대체 (orjson이 있으면 C 파서 사용)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def odumps(obj) -> str:
+    """json.dumps 대체: 로그/DB 저장용 JSON 문자열 (ensure_ascii=False와 같은 출력)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def ojsonify(obj, status: int = 200):
+    """jsonify 대체: dict/list를 JSON 응답으로 변환 (datetime은 그대로 넘겨도 됨)"""
+    if orjson is not None:
+        body = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    else:
+        body = json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+    return current_app.response_class(body, status=status, mimetype='application/json')
@@ -0,0 +1,100 @@
+# Blitz_app/manager_signal.py
+"""
+Wake the BotManager process as soon as a user's bot settings change.
+
+BotManager binds a Unix datagram socket and waits on it together with its
+bot sentinels. Any process (web workers, admin tools) that commits a change
+to User.repeat / API keys / telegram token sends one datagram after the
+commit. If no manager is listening the send is dropped silently and the
+change is picked up on the next poll cycle through the users watermark.
+"""
+
+import logging
+import os
+import socket
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = os.environ.get('BOT_MANAGER_SOCKET', os.path.join(os.getcwd(), 'runtime', 'bot_manager.sock'))
+
+# 봇 실행 여부/설정에 영향을 주는 컬럼 (다른 컬럼 변경으로는 매니저를 깨우지 않음)
+_WATCHED_COLUMNS = ('repeat', 'api_key', 'api_secret', 'telegram_token')
+
+
+def notify_user_changed():
+    """Send a wake-up datagram to the BotManager (no-op if it isn't running)"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.setblocking(False)
+            s.sendto(b'u', SOCKET_PATH)
+    except OSError:
+        pass  # 매니저 미실행/수신 큐 가득 참 → 다음 폴링 주기에 반영
+
+
+def open_listener():
+    """Bind the manager-side socket (non-blocking). None if it can't be bound"""
+    try:
+        os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+        try:
+            os.unlink(SOCKET_PATH)  # 이전 매니저가 남긴 소켓 파일
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(SOCKET_PATH)
+        sock.setblocking(False)
+        return sock
+    except OSError as e:
+        logger.warning(f"Could not bind bot manager socket {SOCKET_PATH}: {e}")
+        return None
+
+
+def drain(sock):
+    """Discard queued wake-ups (several commits collapse into one cycle)"""
+    while True:
+        try:
+            sock.recv(64)
+        except OSError:
+            return
+
+
+def close_listener(sock):
+    sock.close()
+    try:
+        os.unlink(SOCKET_PATH)
+    except OSError:
+        pass
+
+
+def _mark_changed(state):
+    if state.session is not None:
+        state.session.info['user_changed'] = True
+
+
+@event.listens_for(User, 'after_update')
+def _mark_user_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _WATCHED_COLUMNS):
+        _mark_changed(state)
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_delete')
+def _mark_user_insert_delete(mapper, connection, target):
+    _mark_changed(inspect(target))
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(session):
+    # 커밋 후에 보내야 매니저가 바뀐 행을 읽음
+    if session.info.pop('user_changed', False):
+        notify_user_changed()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('user_changed', None)
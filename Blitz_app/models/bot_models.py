@@ -23,6 +23,7 @@ class BotCommand(db.Model):
     # Indexes for performance
     __table_args__ = (
         db.Index('idx_bot_commands_user_status', 'user_id', 'status'),
+        db.Index('idx_bot_commands_user_created', 'user_id', 'created_at'),
         db.Index('idx_bot_commands_created', 'created_at'),
     )
     
@@ -50,7 +51,7 @@ class BotEvent(db.Model):
     # Indexes for performance
     __table_args__ = (
         db.Index('idx_bot_events_user_created', 'user_id', 'created_at'),
-        db.Index('idx_bot_events_type', 'type'),
+        db.Index('idx_bot_events_type_created', 'type', 'created_at'),
     )
     
     @property
@@ -1,5 +1,7 @@
 # Blitz_app/models/user.py
 
+from datetime import datetime
+
 from Blitz_app.extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -27,6 +29,8 @@ class User(UserMixin, db.Model):
     verification_token = db.Column(db.String(255))
     api_password = db.Column(db.String(255))
     skip_uid_check = db.Column(db.Boolean, default=False)
+    # 변경 감지용 워터마크 (BotManager가 MAX(updated_at)로 활성 유저 재조회 여부 판단)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
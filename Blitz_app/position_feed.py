@@ -0,0 +1,289 @@
+# Blitz_app/position_feed.py
+"""
+WebSocket (ccxt.pro) push cache for a bot's position, orders and last price.
+
+run_bot is synchronous ccxt REST code, so each bot starts one background
+thread with its own asyncio loop that subscribes to watch_positions,
+watch_orders and watch_ticker for the bot's symbol. The main loop reads the latest state from
+memory instead of calling fetch_positions / fetch_ticker every tick, and falls
+back to REST whenever the feed is disconnected or due for a resync.
+Order placement and cancellation stay on REST.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+try:
+    import ccxt.pro as ccxtpro
+except ImportError:  # ccxt.pro 미포함 설치 → 항상 REST 사용
+    ccxtpro = None
+
+logger = logging.getLogger(__name__)
+
+# 주문 푸시 캐시 상한 (체결 확인용이라 최근 것만 있으면 충분)
+_MAX_ORDERS = 256
+
+# positionIdx(헤지 모드) → 포지션 방향
+_IDX_SIDE = {'1': 'long', '2': 'short'}
+
+
+def _position_side(p):
+    side = (p.get('side') or '').lower()
+    if side in ('long', 'short'):
+        return side
+    return _IDX_SIDE.get(str((p.get('info') or {}).get('positionIdx')))
+
+
+def _pos_key(p):
+    return p.get('contracts'), p.get('entryPrice')
+
+
+class PositionFeed:
+    """
+    Per-bot position/order/ticker cache fed by ccxt.pro websockets.
+
+    get_position() returns (hit, position). hit is False when the feed cannot
+    be trusted (not connected, or no REST reconciliation within
+    resync_interval seconds); the caller then does a REST fetch and hands the
+    result back through update_from_rest().
+    """
+
+    def __init__(self, exchange_name, exchange_kwargs, symbol, markets=None, resync_interval=60.0, ticker_max_age=5.0):
+        self.exchange_name = exchange_name
+        self.symbol = symbol
+        self.markets = markets
+        self.resync_interval = resync_interval
+        self.ticker_max_age = ticker_max_age
+
+        kwargs = dict(exchange_kwargs)
+        # REST용 requests 프록시 → 웹소켓은 SOCKS 프록시 옵션으로 전달
+        proxies = kwargs.pop('proxies', None) or {}
+        if proxies.get('https'):
+            kwargs['wsSocksProxy'] = proxies['https']
+        self.exchange_kwargs = kwargs
+
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)   # 포지션/주문 푸시 수신 시 notify
+        self._seq = 0               # 포지션/주문 푸시 수신 횟수 (wait_for_update 기준점)
+        self._pos_seq = 0           # 포지션 수량/평단 변경 횟수 (wait_for_position_change 기준점)
+        self._positions = {}        # 'long' | 'short' → ccxt position dict
+        self._orders = {}           # 주문 id → 최신 ccxt order dict (watch_orders)
+        self._connected = False
+        self._synced_at = None      # 마지막 스냅샷/REST 재동기화 시각 (monotonic)
+        self._last_price = None
+        self._last_price_at = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    # ---------- 동기(봇 스레드) 쪽 API ----------
+    def start(self):
+        """Start the websocket thread. Returns False if ccxt.pro is unavailable."""
+        if ccxtpro is None or not hasattr(ccxtpro, self.exchange_name):
+            return False
+        self._thread = threading.Thread(target=self._run, name=f"feed-{self.symbol}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # 루프가 이미 닫힘
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_position(self, side):
+        with self._lock:
+            if not self._connected or self._synced_at is None:
+                return False, None
+            if time.monotonic() - self._synced_at > self.resync_interval:
+                return False, None
+            return True, self._positions.get(side.lower())
+
+    def update_seq(self):
+        with self._lock:
+            return self._seq
+
+    def wait_for_update(self, seq, timeout):
+        """
+        seq(update_seq() 값) 이후 포지션/주문 푸시가 오거나 timeout이 지날 때까지 대기.
+        피드가 없으면 그냥 timeout만큼 sleep하는 것과 같음. 반환: 새 푸시 수신 여부
+        """
+        with self._updated:
+            return self._updated.wait_for(lambda: self._seq != seq, timeout)
+
+    def order_fill(self, order_id):
+        """
+        watch_orders로 받은 주문이 완전 체결됐으면 (filled, average) 반환, 아니면 None.
+        None이면 호출 측이 포지션 조회로 체결 여부를 확인.
+        """
+        with self._lock:
+            o = self._orders.get(str(order_id))
+        if not o or o.get('status') != 'closed':
+            return None
+        filled = float(o.get('filled') or 0)
+        average = float(o.get('average') or o.get('price') or 0)
+        if filled <= 0 or average <= 0:
+            return None
+        return filled, average
+
+    def position_seq(self):
+        with self._lock:
+            return self._pos_seq
+
+    def wait_for_position_change(self, seq, timeout):
+        """
+        seq(position_seq() 값) 이후 포지션 수량/평단이 바뀌거나 timeout이 지날 때까지 대기.
+        주문 푸시(내 TP/SL 수정 등)로는 깨어나지 않음. 반환: 변경 감지 여부
+        """
+        with self._updated:
+            return self._updated.wait_for(lambda: self._pos_seq != seq, timeout)
+
+    def update_from_rest(self, side, position):
+        """REST 조회 결과로 캐시를 보정 (None은 조회 실패일 수 있으므로 재동기화로 치지 않음)"""
+        if position is None:
+            return
+        with self._lock:
+            self._positions[side.lower()] = position
+            self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """다음 get_position()이 REST로 다시 읽도록 강제 (수동 새로고침 등)"""
+        with self._lock:
+            self._synced_at = None
+
+    def last_price(self):
+        with self._lock:
+            if self._last_price and time.monotonic() - self._last_price_at <= self.ticker_max_age:
+                return self._last_price
+        return None
+
+    # ---------- 캐시 갱신 ----------
+    def _apply_positions(self, positions, snapshot=False):
+        with self._lock:
+            before = {k: _pos_key(p) for k, p in self._positions.items()}
+            if snapshot:
+                self._positions.clear()
+            for p in positions or []:
+                if p.get('symbol') != self.symbol:
+                    continue
+                side = _position_side(p)
+                contracts = float(p.get('contracts') or 0)
+                if contracts > 0 and side:
+                    self._positions[side] = p
+                elif side:
+                    self._positions.pop(side, None)
+                else:
+                    # 원웨이 모드 청산 (방향 정보 없음)
+                    self._positions.clear()
+            self._connected = True
+            if snapshot:
+                self._synced_at = time.monotonic()
+            self._seq += 1
+            if {k: _pos_key(p) for k, p in self._positions.items()} != before:
+                self._pos_seq += 1
+            self._updated.notify_all()
+
+    def _apply_orders(self, orders):
+        with self._lock:
+            for o in orders or []:
+                oid = o.get('id')
+                if oid and o.get('symbol') == self.symbol:
+                    self._orders[str(oid)] = o
+            if len(self._orders) > _MAX_ORDERS:
+                # 오래된 것부터 제거 (dict는 삽입 순서 유지)
+                for oid in list(self._orders)[:len(self._orders) - _MAX_ORDERS]:
+                    del self._orders[oid]
+            self._seq += 1
+            self._updated.notify_all()
+
+    def _apply_ticker(self, ticker):
+        last = (ticker or {}).get('last')
+        if last:
+            with self._lock:
+                self._last_price = float(last)
+                self._last_price_at = time.monotonic()
+
+    # ---------- 백그라운드 asyncio 루프 ----------
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            self._task = loop.create_task(self._main())
+            if self._stopped.is_set():
+                self._task.cancel()
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"[PositionFeed] {self.symbol} 피드 종료: {e}")
+        finally:
+            with self._lock:
+                self._connected = False
+            loop.close()
+
+    async def _main(self):
+        ex = getattr(ccxtpro, self.exchange_name)(self.exchange_kwargs)
+        if self.markets:
+            ex.set_markets(self.markets)  # REST 쪽에서 이미 로드한 마켓 재사용
+        try:
+            watchers = [self._watch_positions(ex), self._watch_ticker(ex)]
+            if ex.has.get('watchOrders'):
+                watchers.append(self._watch_orders(ex))
+            await asyncio.gather(*watchers)
+        finally:
+            await ex.close()
+
+    async def _watch_positions(self, ex):
+        snapshot = True
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                positions = await ex.watch_positions([self.symbol])
+                self._apply_positions(positions, snapshot=snapshot)
+                snapshot = False
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 재연결 후 델타만 오므로 REST 재동기화 전까지 캐시 불신
+                with self._lock:
+                    self._connected = False
+                    self._synced_at = None
+                logger.warning(f"[PositionFeed] watch_positions 오류({self.symbol}): {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _watch_orders(self, ex):
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                self._apply_orders(await ex.watch_orders(self.symbol))
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 주문 푸시가 끊겨도 체결 확인은 포지션 조회로 대체되므로 debug 로그만
+                logger.debug(f"[PositionFeed] watch_orders 오류({self.symbol}): {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _watch_ticker(self, ex):
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                self._apply_ticker(await ex.watch_ticker(self.symbol))
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"[PositionFeed] watch_ticker 오류({self.symbol}): {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
@@ -1483,8 +1483,8 @@ def cancel_all_open_orders_hard(ex, symbol, params=None, max_wait=10, retries=3)
         last_error = e  # 계속 진행 (개별 취소로 커버)
 
     # 2) 대기 후 확인
-    t0 = time.time()
-    while time.time() - t0 < max_wait:
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < max_wait:
         try:
             still = ex.fetch_open_orders(symbol, params=params) or []
             if not still:
@@ -1,12 +1,24 @@
+import atexit
+import queue
+import threading
+
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def send_telegram(token, chat_id, message):
-    try:
-        if not token or not chat_id:
-            logging.warning(f"[텔레그램 누락] token/chat_id 없음")
-            return
+# 봇 루프가 텔레그램 응답(200~500ms)을 기다리지 않도록 큐에 넣고 전송 스레드 하나가 순서대로 보냄
+_QUEUE_MAX = 1000
+# 텔레그램 메시지 길이 한도 (큐에 쌓인 같은 채팅방 메시지를 이 길이까지 한 번에 전송)
+_MAX_TEXT = 4096
+_queue = queue.Queue(maxsize=_QUEUE_MAX)
+_sender = None
+_sender_lock = threading.Lock()
 
+
+def _post(session, token, chat_id, message):
+    """전송 후 HTTP 상태 코드 반환 (네트워크 예외 시 None)"""
+    try:
         url = f"https://api.telegram.org/bot{token}/sendMessage"
         payload = {
             "chat_id": chat_id,
@@ -14,9 +26,85 @@ def send_telegram(token, chat_id, message):
             "parse_mode": "HTML"
         }
 
-        response = requests.post(url, json=payload)
+        response = session.post(url, json=payload, timeout=10)
         if not response.ok:
             logging.error(f"[텔레그램 전송 실패] Status: {response.status_code}, 응답: {response.text}")
+        return response.status_code
 
     except Exception as e:
         logging.error(f"[텔레그램 예외 발생] {e}")
+        return None
+
+
+def _new_session():
+    # 세션 하나로 api.telegram.org keep-alive 연결 재사용 (메시지마다 TLS 핸드셰이크 방지)
+    session = requests.Session()
+    # 429(Retry-After 준수)/일시적 게이트웨이 오류만 짧게 재시도
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503),
+                  allowed_methods=frozenset(['POST']), respect_retry_after_header=True)
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
+
+def _sender_loop():
+    session = _new_session()
+    pending = None
+    while True:
+        token, chat_id, message = pending if pending is not None else _queue.get()
+        pending = None
+        parts = [message]
+        # 알림이 몰릴 때는 이미 큐에 있는 같은 채팅방 메시지를 줄바꿈으로 합쳐 요청 1번으로 전송
+        while len(message) < _MAX_TEXT:
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == token and item[1] == chat_id and len(message) + 1 + len(item[2]) <= _MAX_TEXT:
+                message += "\n" + item[2]
+                parts.append(item[2])
+            else:
+                pending = item  # 다른 채팅방/길이 초과 → 다음 전송으로
+                break
+        try:
+            status = _post(session, token, chat_id, message)
+            # 합친 메시지가 거부됨(한 메시지의 HTML 마크업 오류 등 4xx) → 나머지 알림까지 잃지 않도록 하나씩 재전송
+            # (429는 어댑터가 이미 재시도했으므로 나눠 보내면 더 막힘, 네트워크 예외도 재전송 안 함)
+            if len(parts) > 1 and status is not None and 400 <= status < 500 and status != 429:
+                for part in parts:
+                    _post(session, token, chat_id, part)
+        finally:
+            for _ in parts:
+                _queue.task_done()
+
+
+def _ensure_sender():
+    global _sender
+    if _sender is not None:
+        return
+    with _sender_lock:
+        if _sender is None:
+            _sender = threading.Thread(target=_sender_loop, name="telegram-sender", daemon=True)
+            _sender.start()
+
+
+def send_telegram(token, chat_id, message):
+    """메시지를 전송 큐에 넣고 바로 반환 (실제 전송은 telegram-sender 스레드)"""
+    if not token or not chat_id:
+        logging.warning(f"[텔레그램 누락] token/chat_id 없음")
+        return
+
+    _ensure_sender()
+    try:
+        _queue.put_nowait((token, chat_id, message))
+    except queue.Full:
+        logging.error(f"[텔레그램 큐 초과] 메시지 버림: {message[:50]}")
+
+
+def flush(timeout=5.0):
+    """큐에 남은 메시지가 전송될 때까지 최대 timeout초 대기. 반환: 모두 전송 여부"""
+    with _queue.all_tasks_done:
+        return _queue.all_tasks_done.wait_for(lambda: not _queue.unfinished_tasks, timeout)
+
+
+# 프로세스 종료 직전 큐에 남은 알림(종료 메시지 등) 전송
+atexit.register(flush)
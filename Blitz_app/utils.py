@@ -1,6 +1,10 @@
 import ccxt
+import functools
 import math
 import time, random
+from dataclasses import dataclass, field
+from decimal import Decimal
+from flask import current_app
 from flask_login import current_user
 from Blitz_app.models import Proxy
 from Blitz_app import db
@@ -13,6 +17,24 @@ def is_admin():
             (getattr(current_user, "is_admin", False) or 
              current_user.email == "admin@admin.com"))
 
+def admin_required_guard():
+    """before_request guard for admin-only blueprints (view마다 권한 검사하지 않도록)"""
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    if not is_admin():
+        from Blitz_app.json_response import ojsonify
+        return ojsonify({'error': 'Admin access required'}), 403
+
+def owner_or_admin(f):
+    """user_id 라우트 데코레이터: 본인 또는 관리자만 허용 (@login_required 아래에 적용)"""
+    @functools.wraps(f)
+    def wrapper(user_id, *args, **kwargs):
+        if not is_admin() and current_user.id != user_id:
+            from Blitz_app.json_response import ojsonify
+            return ojsonify({'error': 'Forbidden'}), 403
+        return f(user_id, *args, **kwargs)
+    return wrapper
+
 def _to_bool(x):
     if isinstance(x, bool):
         return x
@@ -25,20 +47,84 @@ def _to_bool(x):
         return False
     return None
 
-def _price_precision_to_tick_and_digits(market):
-    p = (market.get('precision', {}) or {}).get('price', None)
-    # 1) precision이 "자릿수"인 경우 (보통 정수)
-    if isinstance(p, int):
-        digits = max(p, 0)
-        tick_size = 10 ** (-digits) if digits > 0 else 1.0
-        return tick_size, digits
-    # 2) precision이 "틱사이즈"인 경우 (보통 0.01, 0.0005 등 실수)
-    if isinstance(p, float) and p > 0:
-        # 0.01 -> 2, 0.0005 -> 4 정도로 반올림 (살짝 보수적으로 잡아도 OK)
-        digits = max(0, int(round(-math.log10(p))))
-        return p, digits
-    # 3) 안전 기본값
-    return 0.00001, 5
+def _precision_step(exchange, p):
+    """
+    ccxt precision 값 → (step, 소수 자릿수)
+    precisionMode가 TICK_SIZE면 p가 곧 step, 아니면 p는 소수 자릿수
+    """
+    if p is None:
+        return None, None
+    try:
+        step = float(p) if exchange.precisionMode == ccxt.TICK_SIZE else 10 ** (-int(p))
+    except (TypeError, ValueError):
+        return None, None
+    if step <= 0:
+        return None, None
+    digits = max(0, -Decimal(repr(step)).normalize().as_tuple().exponent)
+    return step, digits
+
+@dataclass
+class MarketSpec:
+    """심볼별 정밀도/최소수량 (markets가 다시 로드되기 전까지 불변)"""
+    amt_step: float
+    amt_digits: int
+    px_step: float
+    px_digits: int
+    tick: float
+    min_qty: float
+    # ccxt decimal_to_precision과 같은 10진 연산용 step (float 나눗셈 오차/짝수 반올림 방지)
+    _amt_dec: Decimal = field(init=False, repr=False, compare=False, default=None)
+    _px_dec: Decimal = field(init=False, repr=False, compare=False, default=None)
+
+    def __post_init__(self):
+        if self.amt_step is not None:
+            self._amt_dec = Decimal(repr(self.amt_step))
+        if self.px_step is not None:
+            self._px_dec = Decimal(repr(self.px_step))
+
+    def amount(self, raw):
+        """amount_to_precision과 같은 내림(TRUNCATE). step을 모르거나 0이 되면 None"""
+        if self._amt_dec is None:
+            return None
+        d = Decimal(repr(raw))
+        q = float(d - d % self._amt_dec)
+        return q if q > 0 else None
+
+    def price(self, raw):
+        """price_to_precision과 같은 반올림(ROUND, 0.5 step은 올림). step을 모르거나 0이 되면 None"""
+        if self._px_dec is None:
+            return None
+        d = Decimal(repr(raw))
+        step = self._px_dec
+        missing = d % step
+        q = d - missing
+        if missing >= step / 2:
+            q += step
+        q = float(q)
+        return q if q > 0 else None
+
+# (거래소 id, 심볼) → (spec을 만든 markets 객체, MarketSpec)
+_MARKET_SPECS = {}
+
+def market_spec(exchange, symbol) -> MarketSpec:
+    """exchange.market(symbol)의 정밀도/한도를 1회만 해석해서 재사용 (markets 재로드 시 재계산)"""
+    key = (exchange.id, symbol)
+    cached = _MARKET_SPECS.get(key)
+    if cached is not None and cached[0] is exchange.markets:
+        return cached[1]
+    market = exchange.market(symbol)
+    precision = market.get('precision') or {}
+    limits = market.get('limits') or {}
+    amt_step, amt_digits = _precision_step(exchange, precision.get('amount'))
+    px_step, px_digits = _precision_step(exchange, precision.get('price'))
+    spec = MarketSpec(
+        amt_step=amt_step, amt_digits=amt_digits,
+        px_step=px_step, px_digits=px_digits,
+        tick=px_step or float((limits.get('price') or {}).get('min') or 0.0) or 0.00001,
+        min_qty=float((limits.get('amount') or {}).get('min') or 0.0),
+    )
+    _MARKET_SPECS[key] = (exchange.markets, spec)
+    return spec
 
 def _is_tp_sl_tagged(order_obj) -> bool:
     info = order_obj.get('info') or {}
@@ -168,55 +254,63 @@ def _precise_px(exchange, symbol, raw):
     except Exception:
         return float(f"{raw:.8f}")
 
-def place_manual_tp_order(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx=None, exchange_name=None):
-    try:
-        market = exchange.market(symbol)
-        tick_size, digits = _price_precision_to_tick_and_digits(market)  # 이 줄만 남기기!
-        tp_side = 'sell' if ccxt_side == 'buy' else 'buy'
-        raw_tp_price = entry_price * (1 + tp) if ccxt_side == 'buy' else entry_price * (1 - tp)
-        tp_price = float(exchange.price_to_precision(symbol, raw_tp_price))
+def _tp_order_request(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx=None, exchange_name=None):
+    """TP 리밋 주문 요청(create_orders 형식 dict) 생성. 진입가와 너무 가까우면 None"""
+    spec = market_spec(exchange, symbol)
+    tick_size = spec.tick
+    tp_side = 'sell' if ccxt_side == 'buy' else 'buy'
+    raw_tp_price = entry_price * (1 + tp) if ccxt_side == 'buy' else entry_price * (1 - tp)
+    tp_price = spec.price(raw_tp_price) or float(exchange.price_to_precision(symbol, raw_tp_price))
 
-        min_gap = tick_size * 2
-        if abs(tp_price - entry_price) < min_gap:
-            adjusted = entry_price + (min_gap if ccxt_side == 'buy' else -min_gap)
-            tp_price = float(exchange.price_to_precision(symbol, adjusted))
+    min_gap = tick_size * 2
+    if abs(tp_price - entry_price) < min_gap:
+        adjusted = entry_price + (min_gap if ccxt_side == 'buy' else -min_gap)
+        tp_price = spec.price(adjusted) or float(exchange.price_to_precision(symbol, adjusted))
 
-        print(f"[TP] 진입가:{entry_price}, TP가:{tp_price}, tick:{tick_size}, side:{side}")
+    print(f"[TP] 진입가:{entry_price}, TP가:{tp_price}, tick:{tick_size}, side:{side}")
 
-        if (ccxt_side == "buy" and tp_price <= entry_price) or (ccxt_side == "sell" and tp_price >= entry_price):
-            print("[TP] 진입가와 TP 주문가가 너무 가까워서 TP 주문 생략!")
-            return None
+    if (ccxt_side == "buy" and tp_price <= entry_price) or (ccxt_side == "sell" and tp_price >= entry_price):
+        print("[TP] 진입가와 TP 주문가가 너무 가까워서 TP 주문 생략!")
+        return None
 
-        ms = int(time.time() * 1000)
-        exid = getattr(exchange, 'id', exchange_name) or ''
+    ms = int(time.time() * 1000)
+    exid = getattr(exchange, 'id', exchange_name) or ''
+
+    # ✅ 태그는 가능한 모든 필드에 주입
+    tag = f'BOT_TP_{ms}'
+    params = {
+        'text': tag,
+        'clientOrderId': tag,
+        'clientOrderID': tag,
+        'newClientOrderId': tag,
+        'orderLinkId': tag,
+        'label': tag,
+        'timeInForce': 'GTC',
+    }
+
+    if exid == 'bybit':
+        params.update({
+            'category': 'linear',
+            'reduceOnly': True,  # ✅ Bybit는 reduceOnly 사용
+        })
+        if position_idx is not None:
+            params['positionIdx'] = position_idx
+    elif exid == 'bingx':
+        params.update({
+            'positionSide': 'LONG' if side == 'long' else 'SHORT',
+        })
+        params.pop('reduceOnly', None)  # ✅ BingX(Hedge) 오류 109400 방지
 
-        # ✅ 태그는 가능한 모든 필드에 주입
-        tag = f'BOT_TP_{ms}'
-        params = {
-            'text': tag,
-            'clientOrderId': tag,
-            'clientOrderID': tag,
-            'newClientOrderId': tag,
-            'orderLinkId': tag,
-            'label': tag,
-            'timeInForce': 'GTC',
-        }
+    return {'symbol': symbol, 'type': 'limit', 'side': tp_side, 'amount': amount, 'price': tp_price, 'params': params}
 
-        if exid == 'bybit':
-            params.update({
-                'category': 'linear',
-                'reduceOnly': True,  # ✅ Bybit는 reduceOnly 사용
-            })
-            if position_idx is not None:
-                params['positionIdx'] = position_idx
-        elif exid == 'bingx':
-            params.update({
-                'positionSide': 'LONG' if side == 'long' else 'SHORT',
-            })
-            params.pop('reduceOnly', None)  # ✅ BingX(Hedge) 오류 109400 방지
 
-        result = exchange.create_order(symbol, 'limit', tp_side, amount, tp_price, params)
-        print(f"[TP] 리밋 TP 주문: {tp_side} {amount}@{tp_price} (result={result})")
+def place_manual_tp_order(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx=None, exchange_name=None):
+    try:
+        req = _tp_order_request(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx, exchange_name)
+        if req is None:
+            return None
+        result = exchange.create_order(req['symbol'], req['type'], req['side'], req['amount'], req['price'], req['params'])
+        print(f"[TP] 리밋 TP 주문: {req['side']} {amount}@{req['price']} (result={result})")
         return result
 
     except Exception as e:
@@ -224,59 +318,162 @@ def place_manual_tp_order(exchange, symbol, ccxt_side, entry_price, tp, amount,
         raise
 
 
+def _sl_order_request(exchange, symbol, ccxt_side, entry_price, sl, amount, side, position_idx=None, exchange_name=None):
+    """SL 스탑-마켓 주문 요청(create_orders 형식 dict) 생성. 진입가와 너무 가까우면 None"""
+    spec = market_spec(exchange, symbol)
+    tick_size = spec.tick
+    sl_side = 'sell' if ccxt_side == 'buy' else 'buy'
+    raw_stop = entry_price * (1 - sl) if ccxt_side == 'buy' else entry_price * (1 + sl)
+    stop_price = spec.price(raw_stop) or float(exchange.price_to_precision(symbol, raw_stop))
+
+    min_gap = tick_size * 2
+    if abs(stop_price - entry_price) < min_gap:
+        adjusted = (entry_price - min_gap) if ccxt_side == 'buy' else (entry_price + min_gap)
+        stop_price = spec.price(adjusted) or float(exchange.price_to_precision(symbol, adjusted))
+
+    print(f"[SL] 진입가:{entry_price}, stopPrice:{stop_price}, tick:{tick_size}, side:{side}")
+
+    if (ccxt_side == "buy" and stop_price >= entry_price) or (ccxt_side == "sell" and stop_price <= entry_price):
+        print("[SL] 진입가와 SL(트리거) 가격이 너무 가까워서 SL 주문 생략!")
+        return None
+
+    ms = int(time.time() * 1000)
+    exid = getattr(exchange, 'id', exchange_name) or ''
+
+    # ✅ 태그 다중 필드 주입
+    tag = f'BOT_SL_{ms}'
+    params = {
+        'text': tag,
+        'clientOrderId': tag,
+        'clientOrderID': tag,
+        'newClientOrderId': tag,
+        'orderLinkId': tag,
+        'label': tag,
+        'timeInForce': 'GTC',
+        'stopPrice': stop_price,   # ✅ 트리거는 stopPrice로 전달
+    }
+
+    if exid == 'bybit':
+        params['category'] = 'linear'
+        params['reduceOnly'] = True      # ✅ Bybit는 reduceOnly 사용
+        if position_idx is not None:
+            params['positionIdx'] = position_idx
+    elif exid == 'bingx':
+        params['positionSide'] = 'LONG' if side == 'long' else 'SHORT'
+        params.pop('reduceOnly', None)   # ✅ BingX(Hedge) 오류 109400 방지
+
+    # ✅ 스탑-마켓 권장: price=None, type='stop'
+    return {'symbol': symbol, 'type': 'stop', 'side': sl_side, 'amount': amount, 'price': None, 'params': params}
+
+
 def place_manual_sl_order(exchange, symbol, ccxt_side, entry_price, sl, amount, side, position_idx=None, exchange_name=None):
     try:
-        market = exchange.market(symbol)
-        tick_size, digits = _price_precision_to_tick_and_digits(market)  # 이 줄만 남기기!
-        sl_side = 'sell' if ccxt_side == 'buy' else 'buy'
-        raw_stop = entry_price * (1 - sl) if ccxt_side == 'buy' else entry_price * (1 + sl)
-        stop_price = float(exchange.price_to_precision(symbol, raw_stop))
+        req = _sl_order_request(exchange, symbol, ccxt_side, entry_price, sl, amount, side, position_idx, exchange_name)
+        if req is None:
+            return None
+        result = exchange.create_order(req['symbol'], req['type'], req['side'], req['amount'], None, req['params'])
+        print(f"[SL] 스탑 SL 주문: {req['side']} {amount}@TRIGGER({req['params']['stopPrice']}) (result={result})")
+        return result
 
-        min_gap = tick_size * 2
-        if abs(stop_price - entry_price) < min_gap:
-            adjusted = (entry_price - min_gap) if ccxt_side == 'buy' else (entry_price + min_gap)
-            stop_price = float(exchange.price_to_precision(symbol, adjusted))
+    except Exception as e:
+        print(f"손절 주문 실패: {e}")
+        raise
 
-        print(f"[SL] 진입가:{entry_price}, stopPrice:{stop_price}, tick:{tick_size}, side:{side}")
 
-        if (ccxt_side == "buy" and stop_price >= entry_price) or (ccxt_side == "sell" and stop_price <= entry_price):
-            print("[SL] 진입가와 SL(트리거) 가격이 너무 가까워서 SL 주문 생략!")
-            return None
+# createOrders(일괄 주문) 1회당 최대 주문 수 (Bybit batch-place / BingX batchOrders 한도)
+ORDER_BATCH_SIZE = {'bybit': 10, 'bingx': 5}
 
-        ms = int(time.time() * 1000)
-        exid = getattr(exchange, 'id', exchange_name) or ''
 
-        # ✅ 태그 다중 필드 주입
-        tag = f'BOT_SL_{ms}'
-        params = {
-            'text': tag,
-            'clientOrderId': tag,
-            'clientOrderID': tag,
-            'newClientOrderId': tag,
-            'orderLinkId': tag,
-            'label': tag,
-            'timeInForce': 'GTC',
-            'stopPrice': stop_price,   # ✅ 트리거는 stopPrice로 전달
-        }
+def create_orders_batched(exchange, requests):
+    """
+    create_orders 형식 요청 목록을 가능한 한 적은 HTTP 호출로 주문.
+    거래소가 createOrders를 지원하면 한도(ORDER_BATCH_SIZE)만큼 묶어서 보내고,
+    일괄 주문이 실패하거나 거절된 주문(id 없음)만 개별 create_order로 재시도.
+    NetworkError는 전송 여부를 알 수 없어(재시도 시 중복 주문 위험) 그대로 전파.
+    반환: requests와 같은 순서의 주문 결과 리스트
+    """
+    results = [None] * len(requests)
+    batch_size = ORDER_BATCH_SIZE.get(getattr(exchange, 'id', ''), 5)
+    if len(requests) > 1 and exchange.has.get('createOrders'):
+        for i in range(0, len(requests), batch_size):
+            chunk = requests[i:i + batch_size]
+            if len(chunk) < 2:
+                continue  # 1건은 개별 주문과 동일
+            try:
+                res = exchange.create_orders(chunk) or []
+            except ccxt.NetworkError:
+                raise
+            except Exception as e:
+                print(f"[BATCH] 일괄 주문 실패 → 개별 주문으로 재시도: {e}")
+                continue
+            for j, o in enumerate(res[:len(chunk)]):
+                if o and o.get('id'):
+                    results[i + j] = o
 
-        if exid == 'bybit':
-            params['category'] = 'linear'
-            params['reduceOnly'] = True      # ✅ Bybit는 reduceOnly 사용
-            if position_idx is not None:
-                params['positionIdx'] = position_idx
-        elif exid == 'bingx':
-            params['positionSide'] = 'LONG' if side == 'long' else 'SHORT'
-            params.pop('reduceOnly', None)   # ✅ BingX(Hedge) 오류 109400 방지
+    for k, req in enumerate(requests):
+        if results[k] is None:
+            results[k] = exchange.create_order(req['symbol'], req['type'], req['side'], req['amount'], req['price'], req['params'])
+    return results
 
-        # ✅ 스탑-마켓 권장: price=None, type='stop'
-        result = exchange.create_order(symbol, 'stop', sl_side, amount, None, params)
-        print(f"[SL] 스탑 SL 주문: {sl_side} {amount}@TRIGGER({stop_price}) (result={result})")
-        return result
+
+def place_manual_tp_sl_orders(exchange, symbol, ccxt_side, entry_price, tp, sl, amount, side, position_idx=None, exchange_name=None):
+    """
+    TP 리밋 + SL 스탑 주문을 한 번에 배치 (createOrders 지원 시 HTTP 1회).
+    sl <= 0 이면 SL은 생략. 반환: (tp_result, sl_result)
+    """
+    try:
+        tp_req = _tp_order_request(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx, exchange_name)
+        sl_req = _sl_order_request(exchange, symbol, ccxt_side, entry_price, sl, amount, side, position_idx, exchange_name) if sl > 0 else None
+        reqs = [r for r in (tp_req, sl_req) if r]
+        results = iter(create_orders_batched(exchange, reqs))
+        tp_res = next(results) if tp_req else None
+        sl_res = next(results) if sl_req else None
+        if tp_req:
+            print(f"[TP] 리밋 TP 주문: {tp_req['side']} {amount}@{tp_req['price']} (result={tp_res})")
+        if sl_req:
+            print(f"[SL] 스탑 SL 주문: {sl_req['side']} {amount}@TRIGGER({sl_req['params']['stopPrice']}) (result={sl_res})")
+        return tp_res, sl_res
 
     except Exception as e:
-        print(f"손절 주문 실패: {e}")
+        print(f"익절/손절 주문 실패: {e}")
         raise
 
+def amend_tp_sl_orders(exchange, symbol, ccxt_side, entry_price, tp, sl, amount, side,
+                       tp_order_id, sl_order_id=None, position_idx=None, exchange_name=None):
+    """
+    기존 TP/SL 주문을 취소 없이 가격/수량만 수정 (edit_order: Bybit /v5/order/amend, BingX cancelReplace).
+    취소 후 재주문 사이에 포지션이 무방비가 되는 구간이 없음.
+    수정할 수 없으면(주문 id 모름, 미지원, 거래소 거절 등) None → 호출 측에서 취소+재주문.
+    반환: (tp_result, sl_result)
+    """
+    if not tp_order_id or (sl > 0 and not sl_order_id) or not exchange.has.get('editOrder'):
+        return None
+    exid = getattr(exchange, 'id', exchange_name) or ''
+    try:
+        tp_req = _tp_order_request(exchange, symbol, ccxt_side, entry_price, tp, amount, side, position_idx, exchange_name)
+        sl_req = _sl_order_request(exchange, symbol, ccxt_side, entry_price, sl, amount, side, position_idx, exchange_name) if sl > 0 else None
+        if tp_req is None or (sl > 0 and sl_req is None):
+            return None
+
+        results = []
+        for order_id, req in ((tp_order_id, tp_req), (sl_order_id, sl_req)):
+            if req is None:
+                results.append(None)
+                continue
+            if exid == 'bybit':
+                # amend는 가격/수량/트리거만 변경 (orderLinkId 등 태그를 넘기면 다른 주문을 찾으므로 제외)
+                params = {'triggerPrice': req['params']['stopPrice']} if req['type'] == 'stop' else {}
+            else:
+                params = req['params']
+            res = exchange.edit_order(order_id, symbol, req['type'], req['side'], amount, req['price'], params)
+            print(f"[AMEND] {req['type']} {order_id} → {amount}@{req['price'] or req['params'].get('stopPrice')} (result={res})")
+            results.append(res)
+        return tuple(results)
+
+    except Exception as e:
+        print(f"[AMEND] TP/SL 수정 실패 → 취소 후 재주문: {e}")
+        return None
+
 def get_position(exchange, symbol, side, position_idx=None):
     try:
         params = {}
@@ -437,10 +634,9 @@ def ensure_tp_exists(exchange, symbol, side, take_profit, position_idx=None, exc
             if not allow_reprice:
                 return tp_orders[0]
 
-            # 가격 sanity check (틱 간격 2틱 이상 떨어져있는지 확인)
+            # 가격 sanity check (틱 간격 2틱 이상 떨어져있는지 확인) - 틱은 심볼당 1회 해석한 MarketSpec 재사용
             try:
-                market = exchange.market(symbol)
-                tick_size, _ = _price_precision_to_tick_and_digits(market)
+                tick_size = market_spec(exchange, symbol).tick
             except Exception:
                 tick_size = 0.00001
 
@@ -124,6 +124,17 @@ def on_starting(server):
 
 def when_ready(server):
     """Called just after the server is started."""
+    # Create tables / seed admin once in the master, not in every worker.
+    # preload_app=True → reuse the already loaded run:app (a second create_app() would rebind
+    # the global SimpleBotManager to a throwaway app)
+    from Blitz_app import init_db
+    from Blitz_app.extensions import db
+    app = server.app.wsgi()
+    init_db(app)
+    with app.app_context():
+        # 마스터에서 연 풀 연결을 fork된 워커가 공유하지 않도록 닫음
+        db.engine.dispose()
+    server.log.info("Database initialized")
     server.log.info("Blitz Test Server is ready to accept connections")
 
 def on_exit(server):
@@ -1,4 +1,4 @@
-from Blitz_app import create_app
+from Blitz_app import create_app, init_db
 from Blitz_app.extensions import db
 from Blitz_app.models import User
 from Blitz_app.models.trade import Trade
@@ -15,6 +15,5 @@ def make_shell_context():
     }
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
+    init_db(app)
     app.run(host='0.0.0.0', port=8000)
@@ -60,8 +60,8 @@ def test_bot_manager_configuration():
     finally:
         shutil.rmtree(test_dir, ignore_errors=True)
 
-def test_script_creation_and_execution():
-    """Test that scripts are created in the right place with proper permissions"""
+def test_bot_process_start():
+    """Test that bots are forked from the preloaded forkserver instead of a runner script"""
     
     # Create temporary directory for testing
     test_dir = tempfile.mkdtemp()
@@ -75,12 +75,6 @@ def test_script_creation_and_execution():
         # Mock user and database interactions
         mock_user = Mock()
         mock_user.id = 123
-        mock_user.api_key = "test_key"
-        mock_user.api_secret = "test_secret"
-        mock_user.telegram_token = "test_token"
-        mock_user.telegram_chat_id = "test_chat"
-        mock_user.exchange = "bybit"
-        mock_user.to_dict.return_value = {"user_id": 123}
         
         mock_user_bot = Mock()
         mock_user_bot.restart_count = 0
@@ -90,43 +84,37 @@ def test_script_creation_and_execution():
                 with patch('Blitz_app.bot_manager.UserBot') as mock_user_bot_class:
                     with patch('Blitz_app.bot_manager.BotEvent') as mock_bot_event:
                         with patch('Blitz_app.bot_manager.db') as mock_db:
-                            with patch('subprocess.Popen') as mock_popen:
-                                # Setup mocks
-                                mock_user_class.query.get.return_value = mock_user
-                                mock_user_class.query.filter_by.return_value.first.return_value = None
-                                mock_user_bot_class.query.get.return_value = mock_user_bot
-                                
-                                mock_process = Mock()
-                                mock_process.pid = 12345
-                                mock_popen.return_value = mock_process
-                                
-                                from Blitz_app.bot_manager import BotManager
-                                
-                                manager = BotManager(mock_app)
-                                
-                                # Test script creation
+                            # Setup mocks
+                            mock_user_class.query.get.return_value = mock_user
+                            mock_user_class.query.filter_by.return_value.first.return_value = None
+                            mock_user_bot_class.query.get.return_value = mock_user_bot
+                            
+                            from Blitz_app.bot_manager import BotManager
+                            from Blitz_app.bot_runner import run as run_bot_process
+                            
+                            manager = BotManager(mock_app)
+                            manager._epoll = None  # Mock process has no real sentinel
+                            
+                            mock_process = Mock()
+                            mock_process.pid = 12345
+                            with patch.object(manager._ctx, 'Process', return_value=mock_process) as mock_ctx_process:
                                 success = manager._start_bot_process(123)
-                                
-                                assert success, "Bot process should start successfully"
-                                
-                                # Verify script was created in correct location
-                                expected_script = os.path.join(test_dir, "bot_runner_123.py")
-                                assert os.path.exists(expected_script), f"Script should exist at {expected_script}"
-                                
-                                # Verify script permissions (should be readable)
-                                file_stat = os.stat(expected_script)
-                                assert file_stat.st_mode & 0o640, "Script should have read permissions"
-                                
-                                # Verify subprocess was called with Python interpreter
-                                mock_popen.assert_called_once()
-                                call_args = mock_popen.call_args[0][0]
-                                assert call_args[0] == manager.python_executable, "Should use configured Python executable"
-                                assert call_args[1] == '-u', "Should use unbuffered Python"
-                                assert call_args[2] == expected_script, "Should execute the created script"
-                                
-                                print(f"✅ Script created at: {expected_script}")
-                                print(f"✅ Subprocess called with: {' '.join(call_args)}")
-                                print(f"✅ File permissions: {oct(file_stat.st_mode)}")
+                            
+                            assert success, "Bot process should start successfully"
+                            
+                            # Verify the forkserver context was used with the module-level entry point
+                            mock_ctx_process.assert_called_once()
+                            kwargs = mock_ctx_process.call_args.kwargs
+                            assert kwargs['target'] is run_bot_process, "Should run bot_runner.run in the child"
+                            assert kwargs['args'] == (123, os.path.join(test_dir, "bot_123.log")), "Should pass the user id and log path"
+                            mock_process.start.assert_called_once()
+                            assert mock_user_bot.pid == 12345, "Should record the child PID"
+                            assert manager._children[123] is mock_process, "Should track the child process"
+                            
+                            # No runner script is written any more
+                            assert not os.path.exists(os.path.join(test_dir, "bot_runner_123.py"))
+                            
+                            print(f"✅ Bot forked via forkserver, PID: {mock_user_bot.pid}")
                                 
     finally:
         shutil.rmtree(test_dir, ignore_errors=True)
@@ -192,7 +180,7 @@ def main():
         print("✅ Configuration test passed")
         print()
         
-        test_script_creation_and_execution()
+        test_bot_process_start()
         print("✅ Script creation test passed")
         print()
         
@@ -0,0 +1,91 @@
+# tests/test_market_spec.py
+"""
+Test module for MarketSpec rounding used by run_bot instead of ccxt's
+amount_to_precision / price_to_precision
+
+Validates:
+1. amount() truncates exactly like amount_to_precision (TICK_SIZE and DECIMAL_PLACES)
+2. price() rounds half-ticks up exactly like price_to_precision (both modes)
+3. Unknown precision or a result of zero returns None
+"""
+
+import unittest
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ccxt
+
+from Blitz_app.utils import MarketSpec, market_spec
+
+SYMBOL = 'BTC/USDT:USDT'
+
+AMOUNTS = [0.3, 0.29999999, 1.23456, 0.0015, 2.0, 7.77, 123.456789, 0.001, 0.0109]
+PRICES = [100.25, 101.25, 100.75, 0.125, 1.005, 2.675, 0.015, 123.456, 99.995, 0.33333, 1e-05, 25000.5]
+
+
+def _exchange(precision_mode, amount_precision, price_precision):
+    ex = ccxt.bybit()
+    ex.precisionMode = precision_mode
+    ex.set_markets([{
+        'id': 'BTCUSDT', 'symbol': SYMBOL, 'base': 'BTC', 'quote': 'USDT', 'settle': 'USDT',
+        'baseId': 'BTC', 'quoteId': 'USDT', 'settleId': 'USDT',
+        'type': 'swap', 'spot': False, 'margin': False, 'swap': True, 'future': False, 'option': False,
+        'linear': True, 'inverse': False, 'contract': True, 'contractSize': 1.0, 'active': True,
+        'precision': {'amount': amount_precision, 'price': price_precision},
+        'limits': {'amount': {'min': 0.001}, 'price': {'min': None}},
+    }])
+    return ex
+
+
+def _ccxt_or_none(to_precision, raw):
+    # ccxt는 1스텝 미만 결과에 InvalidOrder를 던짐 → MarketSpec은 None
+    try:
+        value = float(to_precision(SYMBOL, raw))
+    except ccxt.InvalidOrder:
+        return None
+    return value if value > 0 else None
+
+
+class TestMarketSpec(unittest.TestCase):
+    """Compare MarketSpec against ccxt for both precision modes"""
+
+    CASES = [
+        (ccxt.TICK_SIZE, 0.001, 0.5),
+        (ccxt.TICK_SIZE, 0.001, 0.01),
+        (ccxt.TICK_SIZE, 0.1, 0.05),
+        (ccxt.DECIMAL_PLACES, 3, 2),
+        (ccxt.DECIMAL_PLACES, 1, 0),
+    ]
+
+    def _assert_matches_ccxt(self, ex, spec):
+        for raw in AMOUNTS:
+            self.assertEqual(spec.amount(raw), _ccxt_or_none(ex.amount_to_precision, raw), f"amount {raw}")
+        for raw in PRICES:
+            self.assertEqual(spec.price(raw), _ccxt_or_none(ex.price_to_precision, raw), f"price {raw}")
+
+    def test_matches_ccxt(self):
+        for mode, amount_precision, price_precision in self.CASES:
+            with self.subTest(mode=mode, amount=amount_precision, price=price_precision):
+                ex = _exchange(mode, amount_precision, price_precision)
+                self._assert_matches_ccxt(ex, market_spec(ex, SYMBOL))
+
+    def test_half_tick_rounds_up(self):
+        ex = _exchange(ccxt.TICK_SIZE, 0.001, 0.5)
+        spec = market_spec(ex, SYMBOL)
+        self.assertEqual(spec.price(100.25), 100.5)
+        self.assertEqual(spec.price(101.25), 101.5)
+
+    def test_unknown_precision_or_zero(self):
+        spec = MarketSpec(amt_step=None, amt_digits=None, px_step=None, px_digits=None, tick=0.01, min_qty=0.0)
+        self.assertIsNone(spec.amount(1.0))
+        self.assertIsNone(spec.price(1.0))
+        spec = MarketSpec(amt_step=0.01, amt_digits=2, px_step=0.5, px_digits=1, tick=0.5, min_qty=0.0)
+        self.assertIsNone(spec.amount(0.001))
+        self.assertIsNone(spec.price(0.2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -230,5 +230,30 @@ class TestRateLimiting(TestCase):
         response = self.client.get('/test-limited')
         self.assertEqual(response.status_code, 429)
 
+class TestEngineOptions:
+    """Test that the repo's engine options work for file and in-memory SQLite"""
+
+    def _app(self, uri):
+        from Blitz_app.config import engine_options
+        from flask_sqlalchemy import SQLAlchemy
+        from sqlalchemy import text
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+        db = SQLAlchemy(app)
+        with app.app_context():
+            assert db.session.execute(text('SELECT 1')).scalar() == 1
+            return db.engine.pool
+
+    def test_memory_uri_uses_static_pool(self):
+        from sqlalchemy.pool import StaticPool
+        assert isinstance(self._app('sqlite:///:memory:'), StaticPool)
+
+    def test_file_uri_uses_sized_queue_pool(self, tmp_path):
+        from sqlalchemy.pool import QueuePool
+        pool = self._app(f"sqlite:///{(tmp_path / 'test.db').as_posix()}")
+        assert isinstance(pool, QueuePool)
+        assert pool.size() == int(os.environ.get('DB_POOL_SIZE', '10'))
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
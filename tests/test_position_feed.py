@@ -0,0 +1,114 @@
+# tests/test_position_feed.py
+"""
+Test module for the websocket position cache used by run_bot
+
+Validates:
+1. Feed is not trusted before a snapshot / after resync_interval
+2. Position deltas update and clear the cached side (hedge and one-way mode)
+3. REST results reconcile the cache; failed REST lookups (None) do not
+4. wait_for_update wakes on a position/order push instead of sleeping out the timeout
+5. Filled entry orders are reported from watch_orders pushes
+6. Position-change waits ignore order pushes and unchanged position pushes
+"""
+
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Blitz_app.position_feed import PositionFeed
+
+SYMBOL = 'BTC/USDT:USDT'
+
+
+def _pos(side, contracts, idx=None):
+    return {'symbol': SYMBOL, 'side': side, 'contracts': contracts,
+            'entryPrice': 100.0, 'info': {'positionIdx': idx}}
+
+
+class TestPositionFeed(unittest.TestCase):
+    """Test PositionFeed cache semantics without opening a websocket"""
+
+    def setUp(self):
+        self.feed = PositionFeed('bybit', {'apiKey': 'k', 'secret': 's',
+                                           'proxies': {'https': 'socks5h://u:p@1.2.3.4:1080'}}, SYMBOL)
+
+    def test_proxy_moved_to_ws_option(self):
+        self.assertNotIn('proxies', self.feed.exchange_kwargs)
+        self.assertEqual(self.feed.exchange_kwargs['wsSocksProxy'], 'socks5h://u:p@1.2.3.4:1080')
+
+    def test_miss_until_snapshot(self):
+        self.assertEqual(self.feed.get_position('long'), (False, None))
+        self.feed._apply_positions([_pos('long', 2)], snapshot=True)
+        hit, pos = self.feed.get_position('long')
+        self.assertTrue(hit)
+        self.assertEqual(pos['contracts'], 2)
+        self.assertEqual(self.feed.get_position('short'), (True, None))
+
+    def test_resync_interval_expires(self):
+        self.feed.resync_interval = 0.0
+        self.feed._apply_positions([_pos('long', 2)], snapshot=True)
+        time.sleep(0.01)
+        self.assertEqual(self.feed.get_position('long'), (False, None))
+
+    def test_close_delta_clears_side(self):
+        self.feed._apply_positions([_pos('long', 2, 1), _pos('short', 1, 2)], snapshot=True)
+        # 헤지 모드 청산: side 없이 positionIdx만 옴
+        self.feed._apply_positions([_pos(None, 0, 2)])
+        self.assertEqual(self.feed.get_position('short'), (True, None))
+        self.assertTrue(self.feed.get_position('long')[1])
+        # 원웨이 모드 청산: 방향 정보 없음 → 전체 초기화
+        self.feed._apply_positions([_pos(None, 0, 0)])
+        self.assertEqual(self.feed.get_position('long'), (True, None))
+
+    def test_other_symbols_ignored(self):
+        other = dict(_pos('long', 5), symbol='ETH/USDT:USDT')
+        self.feed._apply_positions([other], snapshot=True)
+        self.assertEqual(self.feed.get_position('long'), (True, None))
+
+    def test_rest_reconcile(self):
+        self.feed._connected = True
+        self.feed.update_from_rest('long', None)
+        self.assertEqual(self.feed.get_position('long'), (False, None))
+        self.feed.update_from_rest('long', _pos('long', 3))
+        self.assertEqual(self.feed.get_position('long')[1]['contracts'], 3)
+
+    def test_invalidate_forces_rest(self):
+        self.feed._apply_positions([_pos('long', 2)], snapshot=True)
+        self.feed.invalidate()
+        self.assertEqual(self.feed.get_position('long'), (False, None))
+
+    def test_wait_for_update_wakes_on_push(self):
+        seq = self.feed.update_seq()
+        self.assertFalse(self.feed.wait_for_update(seq, 0.01))
+        threading.Timer(0.05, self.feed._apply_positions, args=([_pos('long', 1)],)).start()
+        start = time.monotonic()
+        self.assertTrue(self.feed.wait_for_update(seq, 5.0))
+        self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_order_fill_from_push(self):
+        self.assertIsNone(self.feed.order_fill('1'))
+        seq = self.feed.update_seq()
+        self.feed._apply_orders([{'id': '1', 'symbol': SYMBOL, 'status': 'open', 'filled': 0}])
+        self.assertTrue(self.feed.wait_for_update(seq, 0.01))
+        self.assertIsNone(self.feed.order_fill('1'))
+        self.feed._apply_orders([{'id': '1', 'symbol': SYMBOL, 'status': 'closed', 'filled': 2, 'average': 101.5}])
+        self.assertEqual(self.feed.order_fill('1'), (2.0, 101.5))
+
+    def test_position_change_seq(self):
+        self.feed._apply_positions([_pos('long', 2)], snapshot=True)
+        seq = self.feed.position_seq()
+        # 같은 수량/평단 재전송과 주문 푸시는 포지션 변경이 아님
+        self.feed._apply_positions([_pos('long', 2)])
+        self.feed._apply_orders([{'id': '1', 'symbol': SYMBOL, 'status': 'open'}])
+        self.assertFalse(self.feed.wait_for_position_change(seq, 0.01))
+        self.feed._apply_positions([_pos('long', 3)])
+        self.assertTrue(self.feed.wait_for_position_change(seq, 0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()